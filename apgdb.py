@@ -0,0 +1,266 @@
+# Asynchronous classes for working with a database (the same interface as in the "pgdb" module).
+#
+#   Class name: AsyncDatabase
+#   Methods:
+#       create(db_connect_set) - class method, the constructor of the connected instance
+#       run_query(table_name, params, several) - main method
+#       run_batches(query, params, batch_size, start, key_len, progress_query, progress_params)
+#       read_rows(table_name, columns_statement, condition_statement, order_by_statement, limit)
+#       insert_rows(table_name, values, insert_fields, returning_field)
+#       copy_rows(table_name, df, insert_fields, on_conflict_statement, copy_format)
+#       count_rows(table_name)
+#       close_connection()
+#
+#   Class name: AsyncDatabasePool
+#   Methods:
+#       create(db_connect_set) - class method, the constructor of the pool with all the connections opened
+#       database() - an asynchronous context manager giving the free AsyncDatabase instance of the pool
+#       close_pool()
+
+
+import asyncio
+from contextlib import asynccontextmanager
+from itertools import islice
+from typing import AsyncIterator, Iterable, Self
+import pandas as pd
+import psycopg
+
+import logger as log
+from config_py import DBConnectionSettings
+from pgdb import BatchProgress, DBQueryResult, Rows, get_copy_statements, get_row_key
+
+
+class AsyncDatabase :
+    # a class for working with the database connection on the asynchronous driver (psycopg 3)
+
+    def __init__(self, connect: psycopg.AsyncConnection | None) -> None:
+        ''' Constructor (use the "create" class method to get the connected instance) '''
+        self.connect = connect
+        self.is_connected = connect is not None
+
+    @classmethod
+    async def create(cls, db_connect_set: DBConnectionSettings) -> Self:
+        '''
+        Opening the connection to the database
+        :param db_connect_set: the database connection settings
+        :return: the instance of the AsyncDatabase class (with the "is_connected" flag)
+        '''
+        try :
+            # Each query runs in its own explicit transaction (as in the "pgdb" module)
+            connect = await psycopg.AsyncConnection.connect(
+                **db_connect_set.model_dump(exclude={'pool_size'}),
+                autocommit=True
+            )
+            log.logger.debug('The database has been successfully connected (async).')
+            return cls(connect)
+
+        except Exception as e :
+            log.logger.error(f'An error occurred while connecting database: {e}')
+            return cls(None)
+
+
+    async def run_query(self, query: str, params: tuple = (), several: bool = False) -> DBQueryResult :
+        ''' Main method (several rows of the parameters are sent in the pipeline mode) '''
+        try :
+            async with self.connect.transaction() :
+                async with self.connect.cursor() as cursor :
+                    if several :
+                        await cursor.executemany(query, params)
+                    else :
+                        await cursor.execute(query, params)
+
+                    # We return the data if the request suggested it
+                    if cursor.description :
+                        return DBQueryResult(True, tuple(await cursor.fetchall()))
+
+                    # In other cases, we return the number of affected rows
+                    return DBQueryResult(True, cursor.rowcount)
+
+        except Exception as e :
+            log.logger.error(f"An error occurred while executing the request: {e}")
+            return DBQueryResult(False, None)
+
+
+    async def run_batches(
+            self,
+            query: str,
+            params: Iterable[tuple],
+            batch_size: int,
+            start: int = 0,
+            key_len: int = 1,
+            progress_query: str | None = None,
+            progress_params: tuple = ()
+    ) -> DBQueryResult :
+        '''
+        Running the query for many rows of the parameters in batches - each batch is committed separately
+        (see the "run_batches" method of the "pgdb.Database" class)
+        :return: the progress of the writing (in case of an error - the progress of the committed batches)
+        '''
+        # The rows committed earlier are skipped (the parameters may be a lazy iterator)
+        params_iter = iter(params)
+        rows, affected, last_key = 0, 0, ''
+        for row in islice(params_iter, start) :
+            rows, last_key = rows + 1, get_row_key(row, key_len)
+        try :
+            while batch := tuple(islice(params_iter, batch_size)) :
+                batch_key = get_row_key(batch[-1], key_len)
+                async with self.connect.transaction() :
+                    async with self.connect.cursor() as cursor :
+                        await cursor.executemany(query, batch)
+                        batch_affected = cursor.rowcount
+                        if progress_query :
+                            await cursor.execute(progress_query, progress_params + (rows + len(batch), batch_key))
+                rows, affected, last_key = rows + len(batch), affected + batch_affected, batch_key
+
+        except Exception as e :
+            log.logger.error(f"An error occurred while executing the batch from the row {rows}: {e}")
+            return DBQueryResult(False, BatchProgress(rows, affected, last_key))
+
+        return DBQueryResult(True, BatchProgress(rows, affected, last_key))
+
+
+    async def read_rows(self,
+                        table_name: str,
+                        columns_statement: str = '*',
+                        condition_statement='',
+                        order_by_statement='',
+                        limit: int = 0) -> DBQueryResult :
+        ''' A simple line reader '''
+        if table_name :
+            query = f'SELECT {columns_statement} FROM {table_name}'
+            if condition_statement :
+                query += f' WHERE {condition_statement}'
+            if order_by_statement :
+                query += f' ORDER BY {order_by_statement}'
+            if limit > 0 :
+                query += f' LIMIT {limit}'
+            return await self.run_query(query)
+        return DBQueryResult(False, None)
+
+
+    async def insert_rows(
+            self,
+            table_name: str,
+            values: Rows,
+            insert_fields: tuple[str] | None=None,
+            returning_field: str | None=None
+    ) -> DBQueryResult:
+        ''' Inserting one or multiple rows into a table. '''
+        if table_name and len(values) > 0 and len(values[0]) > 0 :
+            fields_str = ''
+            if insert_fields is not None:
+                fields_str += f'({", ".join(insert_fields)})'
+            placeholders = ', '.join(['%s'] * len(values[0]))
+            query = f"INSERT INTO {table_name} {fields_str} VALUES ({placeholders})"
+            if returning_field is not None:
+                query += f" RETURNING {returning_field}"
+            if len(values)>1:
+                several = True
+            else:
+                # if insert single row
+                several = False
+                values = values[0]
+
+            return await self.run_query(query, params=values, several=several)
+        return DBQueryResult(False, 0)
+
+
+    async def copy_rows(
+            self,
+            table_name: str,
+            df: pd.DataFrame,
+            insert_fields: tuple[str] | None=None,
+            on_conflict_statement: str | None='DO NOTHING',
+            copy_format: str = 'csv'
+    ) -> DBQueryResult:
+        '''
+        Bulk loading of the data frame rows into a table with the "COPY ... FROM STDIN" command
+        (through a temporary table, see the "copy_rows" method of the "pgdb.Database" class)
+        :return: the number of inserted rows
+        '''
+        if table_name and len(df) > 0 :
+            fields_str = ''
+            select_str = '*'
+            if insert_fields is not None:
+                select_str = ', '.join(insert_fields)
+                fields_str = f'({select_str})'
+            tmp_table = f'tmp_{table_name}'
+            create_query, copy_query, buffer = get_copy_statements(tmp_table, table_name, df, insert_fields, copy_format)
+
+            query = f'INSERT INTO {table_name} {fields_str} SELECT {select_str} FROM {tmp_table}'
+            if on_conflict_statement :
+                query += f' ON CONFLICT {on_conflict_statement}'
+            try :
+                async with self.connect.transaction() :
+                    async with self.connect.cursor() as cursor :
+                        await cursor.execute(create_query)
+                        async with cursor.copy(copy_query) as copy :
+                            await copy.write(buffer.getvalue())
+                        await cursor.execute(query)
+                        return DBQueryResult(True, cursor.rowcount)
+
+            except Exception as e :
+                log.logger.error(f"An error occurred while copying the rows: {e}")
+                return DBQueryResult(False, None)
+        return DBQueryResult(False, 0)
+
+
+    async def count_rows(self, table_name):
+        '''Getting the number of rows in a table.'''
+        if table_name :
+            query = f'SELECT COUNT(*) FROM {table_name}'
+            res = (await self.run_query(query)).value[0][0]
+            return DBQueryResult(True, res)
+        return DBQueryResult(False, None)
+
+
+    async def close_connection(self) :
+        ''' Closing the database connection '''
+        try :
+            await self.connect.close()
+            log.logger.debug('The connection to the database is closed (async).')
+        except Exception as e :
+            log.logger.debug(f'An error occurred when closing the connection: {e}')
+
+
+class AsyncDatabasePool :
+    # a class for the concurrent asynchronous work with the database: each task takes its own connection
+
+    def __init__(self, databases: list[AsyncDatabase]) -> None:
+        ''' Constructor (use the "create" class method to get the pool with the opened connections) '''
+        self._databases = databases
+        self._free: asyncio.Queue[AsyncDatabase] = asyncio.Queue()
+        for db in databases :
+            self._free.put_nowait(db)
+        self.is_connected = len(databases) > 0 and all(db.is_connected for db in databases)
+
+    @classmethod
+    async def create(cls, db_connect_set: DBConnectionSettings) -> Self:
+        '''
+        Opening all the connections of the pool at once
+        :param db_connect_set: the database connection settings (the size of the pool is taken from them)
+        :return: the instance of the AsyncDatabasePool class (with the "is_connected" flag)
+        '''
+        databases = await asyncio.gather(
+            *(AsyncDatabase.create(db_connect_set) for _ in range(db_connect_set.pool_size))
+        )
+        log.logger.debug(f'The asynchronous database connection pool ({len(databases)} connections) '
+                         f'has been created.')
+        return cls(list(databases))
+
+
+    @asynccontextmanager
+    async def database(self) -> AsyncIterator[AsyncDatabase] :
+        ''' Waiting for the free connection of the pool (it is returned to the pool on exit) '''
+        db = await self._free.get()
+        try :
+            yield db
+        finally :
+            self._free.put_nowait(db)
+
+
+    async def close_pool(self) :
+        ''' Closing all the connections of the pool '''
+        for db in self._databases :
+            if db.is_connected :
+                await db.close_connection()
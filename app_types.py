@@ -54,7 +54,7 @@ class DBCashRegister(Row) :
 
 # Record in <receipt> table - table for the main information our database - the receipts
 class DBReceipt(Row) :
-    id: str                 # receipt ID (primary key)
+    id: int | str           # receipt key (primary key): the packed bigint or the receipt ID (see "receipt_key")
     receipt_time: datetime  # time registration of the receipt
     store_id: int           # store ID
     cash_reg_id: int        # cash register ID
@@ -62,6 +62,7 @@ class DBReceipt(Row) :
 # Record in <receipt_line> table - table for the main information our database - the receipt lines
 class DBReceiptLine(Row) :
     id: int                 # ID of the receipt line (primary key)
-    id_receipt: str         # receipt ID (primary key)
+    id_receipt: int | str   # receipt key (primary key)
+    receipt_time: datetime  # time registration of the receipt (primary key, the partition key)
     id_item: int            # product ID
     amount: int             # store ID
\ No newline at end of file
@@ -0,0 +1,56 @@
+# A module for benchmarking the sales generation: the object mode against the columnar mode.
+
+import asyncio
+from datetime import datetime
+from time import perf_counter
+import pandas as pd
+
+import sys
+sys.path.append('.')
+
+from config_py import settings
+import logger as log
+from logger import set_logger
+
+log.logger = set_logger(
+    log_common_set=settings.logging.common.model_copy(update=dict(level='WARNING', to_file=False)),
+    log_specific_set=settings.logging.generating
+)
+
+from chain_stores import ChainStores
+
+
+async def run_day(generation_mode: str, processing_day: datetime) -> tuple[int, float] :
+    '''
+    Generating (and reading into a data frame) one day of sales in the specified mode
+    :param generation_mode: the way of generating the receipts ('objects' or 'columnar')
+    :param processing_day: the day of sales
+    :return: the number of generated receipt lines and the execution time in seconds
+    '''
+    settings.store_chain.generation_mode = generation_mode
+
+    time_start = perf_counter()
+    chain_stores = ChainStores(chain_settings=settings.store_chain, processing_day=processing_day)
+    await chain_stores.create_day()
+    df = pd.concat([await s.read_store_day() for s in chain_stores._stores])
+
+    return len(df), perf_counter() - time_start
+
+
+async def main(days: int = 3) :
+    '''
+    The main function of this module
+    :param days: the number of days generated in each mode
+    '''
+    for mode in ('objects', 'columnar') :
+        total_lines, total_time = 0, 0.0
+        for d in range(1, days+1) :
+            lines, seconds = await run_day(generation_mode=mode, processing_day=datetime(2025, 3, d))
+            total_lines += lines
+            total_time += seconds
+        print(f'{mode.rjust(10)} : {total_lines} lines / {total_time:.2f} sec. / '
+              f'{total_lines / total_time:,.0f} lines per sec.')
+
+
+if __name__ == '__main__' :
+    asyncio.run(main())
@@ -0,0 +1,119 @@
+# A module for benchmarking the sales uploading: the row by row insertion (executemany) against the bulk loading
+# with COPY broken down into its steps. Every measurement is rolled back, so the database isn't changed
+# (the days of the sales data files shouldn't be loaded yet, otherwise the conflicting rows are skipped).
+
+from time import perf_counter
+
+import sys
+sys.path.append('.')
+
+from config_py import settings
+import logger as log
+from logger import set_logger
+
+import daily_sales_uploader as up
+from pgdb import Database, get_copy_statements
+
+log.logger = set_logger(
+    log_common_set=settings.logging.common.model_copy(update=dict(level='WARNING', to_file=False)),
+    log_specific_set=settings.logging.uploading
+)
+
+
+def run_executemany(db: Database, tables: tuple, days: tuple) -> float :
+    '''
+    Inserting the rows of the tables row by row (executemany)
+    :param db: the instance of the Database class
+    :param tables: the tuple of (<table name>, <data frame>, <insert fields>, <insert query>)
+    :param days: the first and the last day of the sales (the partitions are created for them)
+    :return: the execution time in seconds
+    '''
+    try :
+        with db.connect.cursor() as cursor :
+            cursor.execute(up.PARTITION_CREATE_QUERY, days)
+            time_start = perf_counter()
+            for _, df, _, query in tables :
+                cursor.executemany(query, up.iter_frame_rows(df))
+            return perf_counter() - time_start
+    finally :
+        db.connect.rollback()
+
+
+def run_copy(db: Database, tables: tuple, days: tuple,
+             fk_checks: bool = True) -> dict[str, tuple[float, float, float]] :
+    '''
+    Bulk loading of the tables as the "copy_rows" method does it, with the time of each step
+    :param db: the instance of the Database class
+    :param tables: the tuple of (<table name>, <data frame>, <insert fields>, <insert query>)
+    :param days: the first and the last day of the sales (the partitions are created for them)
+    :param fk_checks: the foreign keys checking (it's turned off by the replica mode - only for a superuser)
+    :return: the dict. with the time of the encoding, of the COPY into the temporary table
+             and of the INSERT ... SELECT into the table for each table
+    '''
+    results = {}
+    try :
+        with db.connect.cursor() as cursor :
+            cursor.execute(up.PARTITION_CREATE_QUERY, days)
+            if not fk_checks :
+                # The foreign keys are checked by the system triggers, they don't fire in the replica mode
+                cursor.execute('SET LOCAL session_replication_role = replica')
+            for table_name, df, fields, _ in tables :
+                time_start = perf_counter()
+                tmp_table = f'tmp_{table_name}'
+                create_query, copy_query, buffer = get_copy_statements(
+                    tmp_table, table_name, df, fields, settings.upload.copy_format
+                )
+                time_encoded = perf_counter()
+                cursor.execute(create_query)
+                cursor.copy_expert(copy_query, buffer)
+                time_copied = perf_counter()
+                cursor.execute(f'INSERT INTO {table_name} ({", ".join(fields)}) SELECT {", ".join(fields)} '
+                               f'FROM {tmp_table} ON CONFLICT DO NOTHING')
+                results[table_name] = (time_encoded - time_start, time_copied - time_encoded,
+                                       perf_counter() - time_copied)
+            return results
+    finally :
+        db.connect.rollback()
+
+
+def main(repeats: int = 3) :
+    '''
+    The main function of this module (the sales data files are taken from the sales data folder)
+    :param repeats: the number of the runs of each method (the fastest one is printed)
+    '''
+    db = Database(settings.database_connection)
+    if not db.is_connected or not up.load_lookups(db) :
+        print('Couldn\'t connect to the database or read the directories.')
+        return
+
+    list_files = up.get_sales_files()
+    df = up.concat_sales([up.read_sales_file(el) for el in list_files], keys=list_files)
+    tables = (
+        ('receipt', up.get_receipts(df), up.RECEIPT_FIELDS, up.RECEIPT_INSERT_QUERY),
+        ('receipt_line', up.get_receipt_lines(df), up.RECEIPT_LINE_FIELDS, up.RECEIPT_LINE_INSERT_QUERY),
+    )
+    days = up.get_partition_days(df)
+    total_rows = sum(len(el[1]) for el in tables)
+    print(f'{len(list_files)} files / ' + ' / '.join(f'{el[0]} : {len(el[1])} rows' for el in tables))
+
+    time_base = min(run_executemany(db, tables, days) for _ in range(repeats))
+    print(f'{"executemany".rjust(16)} : {time_base:.2f} sec. / {total_rows / time_base:,.0f} rows per sec.')
+
+    for label, fk_checks in (('copy', True), ('copy, no FK', False)) :
+        try :
+            runs = [run_copy(db, tables, days, fk_checks) for _ in range(repeats)]
+        except Exception as e :
+            print(f'{label.rjust(16)} : skipped ({str(e).strip()})')
+            continue
+        steps = min(runs, key=lambda r : sum(map(sum, r.values())))
+        time_total = sum(map(sum, steps.values()))
+        print(f'{label.rjust(16)} : {time_total:.2f} sec. / {total_rows / time_total:,.0f} rows per sec. / '
+              f'x{time_base / time_total:.1f} ('
+              + ', '.join(f'{t} : encoding {e:.2f} + COPY {c:.2f} + INSERT {i:.2f}' for t, (e, c, i) in steps.items())
+              + ')')
+
+    db.close_connection()
+
+
+if __name__ == '__main__' :
+    main()
@@ -4,13 +4,18 @@ import pandas as pd
 import numpy as np
 import random
 import asyncio
+import hashlib
+import os
+import shutil
+from pathlib import Path, PurePath
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from dataclasses import dataclass
-from string import ascii_uppercase, ascii_lowercase
 
-from config_py import settings, StoreChainSettings
+from config_py import settings, dir_name, StoreChainSettings
 import logger as log
-from gen_utils import _check_path, _save_to_csv, post_process_df, save_by_units
+from gen_utils import (_check_path, _save_to_csv, post_process_df, save_by_units, save_unit, get_cash_reg_code,
+                       pack_receipt_keys)
 
 
 RANGE_CATEGORIES = (0, len(settings.store_chain.goods.categories))
@@ -19,18 +24,10 @@ RANGE_CATEGORIES = (0, len(settings.store_chain.goods.categories))
 GOODS_CAPACITY = sum(settings.store_chain.goods.category_capacity) + RANGE_CATEGORIES[1]
 
 
-# The data structure for storing the "skeleton" of the product
-@dataclass(slots=True, frozen=True)
-class Item :
-    category_key: int
-    item_key: int
-    price: int
-    discount: float
-
 # The data structure for storing the receipt line
 @dataclass(slots=True, frozen=True)
 class ReceiptLine :
-    item: Item
+    item_idx: int       # the index of the product in the goods catalog
     amount: int
 
 # The data structure for storing the receipt
@@ -39,13 +36,94 @@ class Receipt :
     receipt_time: datetime
     receipt_lines: np.ndarray
 
+# The data structure for storing the parameters of a cash register day (the unit of work in the columnar mode)
+@dataclass(slots=True, frozen=True)
+class CashRegDay :
+    id_store: int                   # store ID
+    id_cash_reg: int                # cash register ID
+    times: np.ndarray               # all possible times of the receipts in the store day (datetime64[s])
+    daily_load: float               # the maximum number of receipts of the cash register
+    seed: np.random.SeedSequence    # the seed of the own random stream of the cash register
+
+# The data structure for storing the sales of a cash register (or a whole store) in a columnar form:
+# one element of each array - one receipt line
+@dataclass(slots=True, frozen=True)
+class SalesColumns :
+    id_store: int                   # store ID
+    id_cash_reg: np.ndarray         # cash register ID
+    receipt_idx: np.ndarray         # the number of the receipt in the sales of its cash register
+    receipt_time: np.ndarray        # time registration of the receipt (datetime64[s])
+    item_idx: np.ndarray            # the index of the product in the goods catalog
+    amount: np.ndarray              # quantity of the product
+    price: np.ndarray               # retail price
+    discount: np.ndarray            # discount amount
+
+    def __len__(self) -> int :
+        return len(self.item_idx)
+
+
+    def count_collisions(self) -> tuple[int, int] :
+        '''
+        Counting the receipts whose IDs coincide with the IDs of other receipts
+        (the cash register and the time of the receipt are the same)
+        :return: the number of receipts and the number of the collisions
+        '''
+        # The first line of each receipt
+        first = np.ones(len(self), dtype=bool)
+        first[1:] = self.receipt_idx[1:] != self.receipt_idx[:-1]
+        keys = pack_receipt_keys(self.id_store, self.id_cash_reg[first], self.receipt_time[first])
+
+        return int(first.sum()), int(first.sum() - len(np.unique(keys)))
+
+
+    @classmethod
+    def concat(cls, parts: list['SalesColumns']) -> 'SalesColumns' :
+        '''
+        Joining the sales of several cash registers of one store
+        :param parts: the sales of the cash registers
+        :return: the joint sales
+        '''
+        # Shifting the receipt numbers so that they remain unique within the store
+        offsets = np.cumsum([0] + [p.receipt_idx[-1] + 1 if len(p) else 0 for p in parts[:-1]])
+        return cls(
+            id_store=parts[0].id_store,
+            id_cash_reg=np.concatenate([p.id_cash_reg for p in parts]),
+            receipt_idx=np.concatenate([p.receipt_idx + o for p, o in zip(parts, offsets)]),
+            receipt_time=np.concatenate([p.receipt_time for p in parts]),
+            item_idx=np.concatenate([p.item_idx for p in parts]),
+            amount=np.concatenate([p.amount for p in parts]),
+            price=np.concatenate([p.price for p in parts]),
+            discount=np.concatenate([p.discount for p in parts])
+        )
+
 
-def get_prices(sample_size: int) :
+    def to_frame(self) -> pd.DataFrame :
+        '''
+        Building the data frame of sales (the same fields as the object generation mode gives)
+        :return: the data frame with one row per receipt line
+        '''
+        goods = get_goods()
+        return pd.DataFrame(
+            {
+                'id_store': self.id_store,
+                'id_cash_reg': self.id_cash_reg,
+                'doc_id': get_doc_ids(self.id_store, self.id_cash_reg, self.receipt_time),
+                'receipt_time': self.receipt_time,
+                'category_key': goods.category_keys[self.item_idx],
+                'item_key': goods.item_keys[self.item_idx],
+                'price': self.price,
+                'discount': self.discount,
+                'amount': self.amount
+            }
+        )
+
+
+def get_prices(sample_size: int, rs: np.random.RandomState) :
     min_p, max_p = settings.store_chain.goods.price_distribution.range_prices
     mean_p = settings.store_chain.goods.price_distribution.mean_price
 
     # Generating a lognormal distribution
-    data = np.random.lognormal(
+    data = rs.lognormal(
         mean=np.log(mean_p),
         sigma=(1.38-0.6*(mean_p/max_p/0.05)),   # the empirical formula
         size=GOODS_CAPACITY*10
@@ -54,54 +132,379 @@ def get_prices(sample_size: int) :
     # Bringing it to the range from min price to max price in chain stores
     data = np.clip(a=(data - data.min() + 10), a_min=min_p, a_max=max_p)
 
-    return np.random.choice(a=data, size=sample_size)
+    return rs.choice(a=data, size=sample_size)
+
+
+def get_popularity(category_keys: np.ndarray, zipf_exponent: float, rs: np.random.RandomState) -> np.ndarray :
+    '''
+    The Zipf-like popularity of the products inside their category: the product of the rank "r" (random order)
+    gets the weight 1/r^s, the total weight of each category is equal to its number of products
+    :param category_keys: the category keys of the products (sorted)
+    :param zipf_exponent: the exponent "s" of the Zipf distribution
+    :param rs: the random state of the goods catalog
+    :return: the probabilities of the products
+    '''
+    # The random ranks of the products inside their category
+    order = np.lexsort((rs.random_sample(len(category_keys)), category_keys))
+    offsets = np.searchsorted(category_keys, category_keys[order])
+    ranks = np.empty(len(category_keys))
+    ranks[order] = np.arange(len(category_keys)) - offsets + 1
+
+    weights = ranks ** -zipf_exponent
+    # Normalizing the weights inside each category
+    capacities = np.bincount(category_keys)
+    weights *= (capacities / np.bincount(category_keys, weights=weights))[category_keys]
+
+    return weights / weights.sum()
+
+
+def get_alias_table(probs: np.ndarray) -> tuple[np.ndarray, np.ndarray] :
+    '''
+    Building the alias table (the Vose's method) for the O(1) sampling from the discrete distribution
+    :param probs: the probabilities of the outcomes
+    :return: the probabilities of keeping the outcome and the alias outcomes
+    '''
+    scaled = (probs * len(probs)).tolist()
+    alias_prob = [1.0] * len(probs)
+    alias_idx = list(range(len(probs)))
+
+    small = [i for i, p in enumerate(scaled) if p < 1.0]
+    large = [i for i, p in enumerate(scaled) if p >= 1.0]
+    while small and large :
+        s, l = small.pop(), large.pop()
+        alias_prob[s], alias_idx[s] = scaled[s], l
+        scaled[l] += scaled[s] - 1.0
+        (small if scaled[l] < 1.0 else large).append(l)
+
+    return np.asarray(alias_prob), np.asarray(alias_idx, dtype=np.int32)
+
+
+def get_doc_ids(id_store: int, id_cash_regs: np.ndarray, receipt_times: np.ndarray) -> np.ndarray :
+    '''
+    Vectorized building of the receipt IDs like "AaYYYYMMDDHHMMSS" (the code of the cash register and the time)
+    :param id_store: store ID
+    :param id_cash_regs: cash register IDs (one per receipt line)
+    :param receipt_times: the time of the receipt (datetime64[s], one per receipt line)
+    :return: the array of the receipt IDs
+    '''
+    t = receipt_times.astype('datetime64[s]')
+    years = t.astype('datetime64[Y]')
+    months = t.astype('datetime64[M]')
+    days = t.astype('datetime64[D]')
+    seconds = (t - days).astype(np.int64)
+
+    # Packing the date and time into one number YYYYMMDDHHMMSS
+    stamps = (
+        (years.astype(np.int64) + 1970) * 10**10 +
+        ((months - years).astype(np.int64) + 1) * 10**8 +
+        ((days - months).astype(np.int64) + 1) * 10**6 +
+        (seconds // 3600) * 10**4 +
+        (seconds % 3600 // 60) * 10**2 +
+        seconds % 60
+    )
+    id_cash_regs = np.asarray(id_cash_regs)
+    codes = np.asarray(
+        [get_cash_reg_code(id_store, j) for j in range(1, id_cash_regs.max(initial=0) + 1)], dtype=np.str_
+    )
+    return np.strings.add(codes[id_cash_regs - 1], stamps.astype(np.str_))
 
 
 class Goods :
+    '''
+    The goods catalog of the chain stores in a "struct of arrays" form:
+    one element of each array - one product (the index of the element is the index of the product)
+    '''
+    # The arrays of the catalog (the names of the snapshot files)
+    _fields = ('category_keys', 'item_keys', 'prices', 'discounts', 'quantities')
+    # The arrays of the alias table (only for the catalog with the popularity model)
+    _alias_fields = ('alias_prob', 'alias_idx')
 
-    def __init__(self) :
-        # Setting the seed-coefficient for the repeatability of the goods parameters
-        np.random.seed(0)
+    def __init__(self,
+                 category_keys: np.ndarray,
+                 item_keys: np.ndarray,
+                 prices: np.ndarray,
+                 discounts: np.ndarray,
+                 quantities: np.ndarray,
+                 alias_prob: np.ndarray | None = None,
+                 alias_idx: np.ndarray | None = None) :
+        self.category_keys: np.ndarray = category_keys
+        self.item_keys: np.ndarray = item_keys
+        self.prices: np.ndarray = prices
+        self.discounts: np.ndarray = discounts
+        # The distribution of quantities for general use
+        self.quantities: np.ndarray = quantities
+        # The alias table for the weighted sampling of the products (None - all products are equally popular)
+        self.alias_prob: np.ndarray | None = alias_prob
+        self.alias_idx: np.ndarray | None = alias_idx
+
+
+    @classmethod
+    def create(cls) -> 'Goods' :
+        '''
+        Building the goods catalog from the settings
+        :return: the instance of the Goods class
+        '''
+        # Own random state with the seed-coefficient for the repeatability of the goods parameters
+        # (the global random state is not touched)
+        rs = np.random.RandomState(0)
 
         # Formation of prices for goods
-        prices = get_prices(sample_size=GOODS_CAPACITY)
+        prices = get_prices(sample_size=GOODS_CAPACITY, rs=rs)
 
         # Formation of discounts on goods
-        discounts = np.random.choice(
+        discounts = rs.choice(
             a=settings.store_chain.goods.discounts.discounts_values,
             p=settings.store_chain.goods.discounts.discounts_probs,
             size=GOODS_CAPACITY
         )
-        t_goods = (
-            [
-                [x, y] for x in range(*RANGE_CATEGORIES)
-                       for y in range(0, settings.store_chain.goods.category_capacity[x] + 1)
-            ]
-        )
-        # Formation of goods
-        self.goods: np.ndarray = np.array([Item(c, i, p, d) for (c, i), p, d in zip(t_goods, prices, discounts)])
+
+        # Formation of goods: the keys of the category and of the product inside the category
+        capacities = np.asarray(settings.store_chain.goods.category_capacity[slice(*RANGE_CATEGORIES)]) + 1
+        category_keys = np.repeat(np.arange(*RANGE_CATEGORIES, dtype=np.int16), capacities)
+        # The index of the first product of each category
+        offsets = np.concatenate(([0], np.cumsum(capacities)[:-1]))
+        item_keys = (np.arange(len(category_keys)) - offsets[category_keys]).astype(np.int32)
 
         # Formation of the distribution of quantities for general use
-        self.quantities: np.ndarray = np.floor(np.random.exponential(2, size=GOODS_CAPACITY*10) + 1).astype(int)
+        quantities = np.floor(rs.exponential(2, size=GOODS_CAPACITY*10) + 1).astype(np.int16)
+
+        # Formation of the popularity of goods (built once per catalog)
+        alias_prob, alias_idx = None, None
+        zipf_exponent = settings.store_chain.goods.popularity.zipf_exponent
+        if zipf_exponent > 0 :
+            alias_prob, alias_idx = get_alias_table(
+                get_popularity(category_keys=category_keys, zipf_exponent=zipf_exponent, rs=rs)
+            )
+
+        return cls(
+            category_keys=category_keys,
+            item_keys=item_keys,
+            prices=prices[:len(category_keys)],
+            discounts=discounts[:len(category_keys)],
+            quantities=quantities,
+            alias_prob=alias_prob,
+            alias_idx=alias_idx
+        )
+
+
+    @classmethod
+    def load(cls, path: PurePath) -> 'Goods | None' :
+        '''
+        Loading the goods catalog from the snapshot (the arrays are memory-mapped)
+        :param path: the folder of the snapshot
+        :return: the instance of the Goods class (None - if there is no snapshot)
+        '''
+        if not Path(path).is_dir() :
+            return None
+        try :
+            return cls(
+                **{f: np.load(Path(path, f'{f}.npy'), mmap_mode='r') for f in cls._fields},
+                **{f: np.load(Path(path, f'{f}.npy'), mmap_mode='r') for f in cls._alias_fields
+                   if Path(path, f'{f}.npy').is_file()}
+            )
+        except Exception as e :
+            log.logger.warning(f'The goods catalog snapshot "{path}" has not been loaded: {e}')
+            return None
+
+
+    def save(self, path: PurePath) -> bool :
+        '''
+        Saving the snapshot of the goods catalog (one ".npy" file per array)
+        :param path: the folder of the snapshot
+        :return: a boolean value is an indicator of the operation's success.
+        '''
+        # Writing to the temporary folder first, so that the parallel processes never see a partial snapshot
+        path_tmp = Path(f'{path}.{os.getpid()}.tmp')
+        try :
+            path_tmp.mkdir(parents=True, exist_ok=True)
+            for f in self._fields + self._alias_fields :
+                if getattr(self, f) is not None :
+                    np.save(PurePath.joinpath(path_tmp, f'{f}.npy'), getattr(self, f))
+            path_tmp.rename(path)
+        except OSError as e :
+            shutil.rmtree(path_tmp, ignore_errors=True)
+            if not Path(path).is_dir() :
+                log.logger.warning(f'The goods catalog snapshot "{path}" has not been saved: {e}')
+                return False
+        return True
+
+
+    def __len__(self) -> int :
+        return len(self.item_keys)
+
+
+    def _apply_alias(self, idx: np.ndarray, u: np.ndarray) -> np.ndarray :
+        '''
+        Turning uniformly sampled products into the weighted ones with the alias table (O(1) per product)
+        :param idx: the uniformly sampled indexes of the products
+        :param u: the uniform random numbers from [0, 1) (one per product)
+        :return: the indexes of the products
+        '''
+        return np.where(u < self.alias_prob[idx], idx, self.alias_idx[idx]).astype(np.int32)
 
 
     def get_basket(self, items_in_basket: int) -> np.ndarray :
+        if self.alias_prob is None :
+            items = np.random.choice(a=len(self), size=items_in_basket)
+        else :
+            items = self._apply_alias(np.random.randint(0, len(self), size=items_in_basket),
+                                      np.random.random_sample(size=items_in_basket))
         return np.asarray(
             [
-                ReceiptLine(i, a) for i, a in zip(np.random.choice(a=self.goods, size=items_in_basket),
+                ReceiptLine(i, a) for i, a in zip(items,
                                                   np.random.choice(a=self.quantities, size=items_in_basket))
             ], dtype=ReceiptLine
         )
 
 
-goods = Goods()
+    def get_basket_columns(self, lines: int, rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray] :
+        '''
+        Generating the goods of many receipts at once
+        :param lines: the total number of receipt lines
+        :param rng: the random generator of the cash register
+        :return: the indexes of the products in the catalog and their quantities
+        '''
+        items = rng.integers(0, len(self), size=lines, dtype=np.int32)
+        if self.alias_prob is not None :
+            items = self._apply_alias(items, rng.random(size=lines))
+
+        return items, rng.choice(a=self.quantities, size=lines).astype(np.int16)
+
+
+_goods: Goods | None = None     # Global variable for save only one instance of the goods catalog
+
+
+def get_goods() -> Goods :
+    '''
+    Getting the goods catalog: it is built on the first use or loaded from the snapshot
+    keyed by the hash of the "goods" settings section (if the snapshot folder is set)
+    :return: the instance of the Goods class
+    '''
+    global _goods
+    if _goods is not None :
+        return _goods
+
+    if not settings.goods_catalog_path :
+        _goods = Goods.create()
+        return _goods
+
+    key = hashlib.sha1(settings.store_chain.goods.model_dump_json().encode('utf-8')).hexdigest()[:16]
+    path = PurePath.joinpath(dir_name, settings.goods_catalog_path, f'goods_{key}')
+
+    _goods = Goods.load(path)
+    if _goods is None :
+        _goods = Goods.create()
+        if _goods.save(path) :
+            log.logger.debug(f'The goods catalog snapshot has been saved: {path}')
+    else :
+        log.logger.debug(f'The goods catalog has been loaded from the snapshot: {path}')
+
+    return _goods
+
+
+def get_sales_columns(id_store: int,
+                      id_cash_regs: np.ndarray,
+                      receipt_times: np.ndarray,
+                      rng: np.random.Generator) -> SalesColumns :
+    '''
+    Generating the receipt lines of many receipts in a few bulk calls (the columnar generation mode)
+    :param id_store: store ID
+    :param id_cash_regs: cash register IDs (one per receipt)
+    :param receipt_times: the time of each receipt (datetime64[s])
+    :param rng: the random generator of the cash register
+    :return: the sales in a columnar form
+    '''
+    goods = get_goods()
+    # Generating the number of lines in each receipt (from goods.quantities - exponential distribution)
+    lines_in_receipts = rng.choice(a=goods.quantities, size=len(receipt_times))
+    # Expanding the receipts into the receipt lines
+    receipt_idx = np.repeat(np.arange(len(receipt_times), dtype=np.int32), lines_in_receipts)
+    # Filling in all receipt lines at once
+    item_idx, amount = goods.get_basket_columns(lines=len(receipt_idx), rng=rng)
+
+    return SalesColumns(
+        id_store=id_store,
+        id_cash_reg=id_cash_regs[receipt_idx].astype(np.int16),
+        receipt_idx=receipt_idx,
+        receipt_time=receipt_times[receipt_idx],
+        item_idx=item_idx,
+        amount=amount,
+        price=goods.prices[item_idx],
+        discount=goods.discounts[item_idx]
+    )
+
+
+def create_cash_reg_sales(cash_reg_day: CashRegDay) -> SalesColumns :
+    '''
+    Creating the sales of a cash register day in the columnar form (the unit of work for the worker processes)
+    :param cash_reg_day: the parameters of the cash register day
+    :return: the sales of the cash register
+    '''
+    # Each cash register has its own random stream, so the result doesn't depend on the order of execution
+    rng = np.random.default_rng(cash_reg_day.seed)
+    # The times of the receipts are sampled without replacement, so each receipt gets its own unique ID
+    times = rng.choice(
+        a=cash_reg_day.times,
+        size=min(round(cash_reg_day.daily_load * rng.uniform(*settings.store_chain.range_of_cash_regs_daily_load)),
+                 len(cash_reg_day.times)),
+        replace=False
+    )
+    # Sorting receipts by time
+    times.sort()
+
+    return get_sales_columns(
+        id_store=cash_reg_day.id_store,
+        id_cash_regs=np.full(len(times), cash_reg_day.id_cash_reg),
+        receipt_times=times,
+        rng=rng
+    )
+
+
+def create_store_sales(cash_reg_days: list[CashRegDay]) -> SalesColumns :
+    '''
+    Creating the sales of a store day in the columnar form (the unit of work for the worker processes)
+    :param cash_reg_days: the parameters of each cash register day of the store
+    :return: the sales of all cash registers of the store
+    '''
+    return SalesColumns.concat([create_cash_reg_sales(d) for d in cash_reg_days])
+
+
+def stream_cash_reg_day(cash_reg_day: CashRegDay, path_save: str) -> tuple[int, int, int] :
+    '''
+    Creating, post-processing and saving the sales of a cash register day at once (the streaming mode).
+    Nothing is kept in memory after the file has been written.
+    :param cash_reg_day: the parameters of the cash register day
+    :param path_save: the path to save
+    :return: the number of saved receipt lines, the number of receipts and the number of receipt ID collisions
+    '''
+    sales = create_cash_reg_sales(cash_reg_day)
+    df = post_process_df(sales.to_frame())
+    save_unit(
+        df=df.drop(columns=['id_store', 'id_cash_reg']),
+        path_save=path_save,
+        id_store=cash_reg_day.id_store,
+        id_cash_reg=cash_reg_day.id_cash_reg
+    )
+    return len(df), *sales.count_collisions()
+
+
+def log_collisions(receipts: int, collisions: int) :
+    '''
+    Logging the rate of the receipt ID collisions (the receipts with the same IDs are merged into one receipt
+    and lost at the uploading stage)
+    :param receipts: the number of generated receipts
+    :param collisions: the number of receipts whose IDs coincide with the IDs of other receipts
+    '''
+    log_func = log.logger.warning if collisions else log.logger.info
+    log_func(f'{receipts} receipts have been generated, the receipt ID collisions: {collisions} '
+             f'({collisions / max(receipts, 1):.2%}).')
 
 
 class CashRegister :
 
     def __init__(self, id_store: int, id_cash_reg: int, times: np.ndarray) :
         self._id_store: int = id_store
-        self._id_cash_reg: int = id_cash_reg            # ascii_lowercase[id_cash_reg]
+        self._id_cash_reg: int = id_cash_reg            # see get_cash_reg_code
         #
         self._receipts_times: np.ndarray = times
         #
@@ -113,52 +516,47 @@ class CashRegister :
     async def create_cash_reg_day(self) :
         # Sorting receipts by time
         self._receipts_times.sort()
+        goods = get_goods()
         # Generating the number of lines in each receipt (from goods.quantities - exponential distribution)
         lines_in_receipts: np.ndarray[int] = np.random.choice(a=goods.quantities,size=len(self._receipts_times))
         # Creating all receipts
         self._receipts = np.asarray(
             [
                 Receipt(
-                    receipt_time=datetime.fromtimestamp(tms),
+                    receipt_time=tms.item(),
                     receipt_lines=goods.get_basket(lns)
                 ) for tms, lns in zip(self._receipts_times, lines_in_receipts)
             ]
         )
 
 
-    async def get_chunk(self, receipt: Receipt) -> pd.DataFrame:
-        df = pd.DataFrame(
-            [
-                {
-                    'id_store':self._id_store,
-                    'id_cash_reg':self._id_cash_reg,
-                    'doc_id': (
-                        ascii_uppercase[self._id_store-1]+
-                        ascii_lowercase[self._id_cash_reg-1]+
-                        r.receipt_time.strftime('%Y%m%d%H%M%S')
-                    ),
-                    'receipt_time' : r.receipt_time,
-                    'category_key' : ln.item.category_key,
-                    'item_key' : ln.item.item_key,
-                    'price' : ln.item.price,
-                    'discount' : ln.item.discount,
-                    'amount' : ln.amount
-                }
-                for r in [receipt] for ln in r.receipt_lines
-            ]
+    def get_sales_columns(self) -> SalesColumns :
+        '''
+        Converting the receipts of the cash register day into the columnar form in one pass
+        :return: the sales of the cash register
+        '''
+        lines = [ln for r in self._receipts for ln in r.receipt_lines]
+        receipt_idx = np.repeat(np.arange(len(self._receipts)),
+                                [len(r.receipt_lines) for r in self._receipts])
+        receipt_times = np.array([r.receipt_time for r in self._receipts], dtype='datetime64[s]')
+        item_idx = np.array([ln.item_idx for ln in lines], dtype=np.int32)
+        goods = get_goods()
+
+        return SalesColumns(
+            id_store=self._id_store,
+            id_cash_reg=np.full(len(lines), self._id_cash_reg),
+            receipt_idx=receipt_idx,
+            receipt_time=receipt_times[receipt_idx],
+            item_idx=item_idx,
+            amount=np.array([ln.amount for ln in lines], dtype=np.int16),
+            price=goods.prices[item_idx],
+            discount=goods.discounts[item_idx]
         )
 
-        return df
-
 
     async def read_cash_reg_day(self) -> pd.DataFrame :
-        # Async run processes of creating sales for each store
-        async with asyncio.TaskGroup() as tg :
-            tasks = []
-            for r in self._receipts :
-                tasks.append(tg.create_task(self.get_chunk(receipt=r)))
-
-        return pd.concat([task.result() for task in tasks])
+        # Building the data frame of the whole cash register day in a single construction
+        return self.get_sales_columns().to_frame()
 
 
 class Store :
@@ -170,9 +568,10 @@ class Store :
                  opening_hour: int,
                  closing_hour: int,
                  processing_date: datetime,
-                 store_daily_load: float) :
+                 store_daily_load: float,
+                 seed_factor: int) :
         #
-        self._id_store = id_store   # ascii_uppercase[id_store]
+        self._id_store = id_store   # see get_cash_reg_code
         self._num_cash_regs: int = num_cash_regs
         # self._rank: int = rank
         self._opening_hour: int  = opening_hour
@@ -181,18 +580,53 @@ class Store :
         self._times: np.ndarray | None = None
         self._store_daily_load : float = store_daily_load
         self._cash_regs: list[CashRegister] = []
+        self._sales: SalesColumns | None = None
+        self._seed_factor: int = seed_factor
         #
         log.logger.debug(
             f'The store "{self._id_store}" has been created with params: number of cash registers: {self._num_cash_regs} / '
             f'opening hours: from {self._opening_hour} to {self._closing_hour} / daily load: {self._store_daily_load}')
 
 
+    def _set_times(self) :
+        day_start = np.datetime64(self._processing_date.date(), 's')
+        ts_start = day_start + np.timedelta64(self._opening_hour, 'h')
+        ts_stop = day_start + np.timedelta64(self._closing_hour, 'h')
+
+        self._times = np.arange(ts_start, ts_stop, np.timedelta64(settings.store_chain.min_sec_per_cash_transaction, 's'))
+
+
+    def get_cash_reg_days(self) -> list[CashRegDay] :
+        '''
+        Getting the parameters of each cash register day of the store (for the columnar mode)
+        :return: the list of the cash register days
+        '''
+        self._set_times()
+        daily_load = len(self._times) * self._store_daily_load
+
+        return [
+            CashRegDay(
+                id_store=self._id_store,
+                id_cash_reg=i,
+                times=self._times,
+                daily_load=daily_load,
+                # The random stream is derived from the date seed and doesn't depend on the number of workers
+                seed=np.random.SeedSequence(entropy=self._seed_factor, spawn_key=(self._id_store, i))
+            ) for i in range(1, self._num_cash_regs+1)
+        ]
+
+
+    def set_sales(self, sales: SalesColumns) :
+        self._sales = sales
+
+
     async def create_store_day(self) :
-        clear_hour = dict(minute=0, second=0, microsecond=0)
-        ts_start = self._processing_date.replace(hour=self._opening_hour, **clear_hour).timestamp()
-        ts_stop = self._processing_date.replace(hour=self._closing_hour, **clear_hour).timestamp()
+        if settings.store_chain.generation_mode == 'columnar' :
+            # Creating the sales of all cash registers of the store in a few bulk calls
+            self._sales = create_store_sales(self.get_cash_reg_days())
+            return
 
-        self._times = np.arange(start=ts_start, stop=ts_stop, step=settings.store_chain.min_sec_per_cash_transaction)
+        self._set_times()
         daily_load = len(self._times) * self._store_daily_load
 
         # Creating all cash_registers for store
@@ -201,9 +635,12 @@ class Store :
                 CashRegister(
                     id_store=self._id_store,
                     id_cash_reg=i+1,
+                    # The times of the receipts are sampled without replacement (the unique receipt IDs)
                     times=np.random.choice(
                         a=self._times,
-                        size=round(daily_load * random.uniform(*settings.store_chain.range_of_cash_regs_daily_load))
+                        size=min(round(daily_load * random.uniform(*settings.store_chain.range_of_cash_regs_daily_load)),
+                                 len(self._times)),
+                        replace=False
                     )
                 )
             )
@@ -218,18 +655,21 @@ class Store :
             task.result()
 
 
-    async def read_store_day(self) -> pd.DataFrame:
-        # Async run processes of reading sales(cash receipts) for each cash register
+    def get_sales_columns(self) -> SalesColumns :
+        '''
+        Getting the sales of the store day in the columnar form
+        :return: the sales of all cash registers of the store
+        '''
+        if self._sales is not None :
+            return self._sales
 
-        async with asyncio.TaskGroup() as tg :
-            tasks = []
-            for cr in self._cash_regs :
-                tasks.append(tg.create_task(cr.read_cash_reg_day()))
+        self._sales = SalesColumns.concat([cr.get_sales_columns() for cr in self._cash_regs])
+        return self._sales
 
-        # for task in tasks :
-        #     task.result()
 
-        return pd.concat([task.result() for task in tasks])
+    async def read_store_day(self) -> pd.DataFrame:
+        # Building the data frame of the whole store day in a single construction
+        return self.get_sales_columns().to_frame()
 
 
 
@@ -241,6 +681,7 @@ class ChainStores :
         random.seed(seed_factor)
         np.random.seed(seed_factor)
 
+        self._seed_factor = seed_factor
         self._chain_settings = chain_settings
         self._processing_day = processing_day
         self._chain_daily_load = random.uniform(*settings.store_chain.range_of_chain_daily_load)
@@ -251,7 +692,7 @@ class ChainStores :
                          f'daily load: {self._chain_daily_load} processing day: {self._processing_day.date()}.')
 
 
-    async def create_day(self) :
+    def _create_stores(self) :
         # Creating all stores
         for i in range(len(self._chain_settings.stores.cash_registers)) :
             self._stores.append(
@@ -261,10 +702,27 @@ class ChainStores :
                     opening_hour=self._chain_settings.stores.opening_hours[i][0],
                     closing_hour=self._chain_settings.stores.opening_hours[i][1],
                     processing_date=self._processing_day,
-                    store_daily_load=self._chain_daily_load * self._chain_settings.stores.ranks[i] / 100.0
+                    store_daily_load=self._chain_daily_load * self._chain_settings.stores.ranks[i] / 100.0,
+                    seed_factor=self._seed_factor
                 )
             )
 
+
+    async def create_day(self, workers: int = 1, by_cash_regs: bool = False) :
+        '''
+        Creating the sales of all stores of the chain
+        :param workers: the number of worker processes (1 - everything is generated in the current process)
+        :param by_cash_regs: the flag for distributing cash registers (not whole stores) between the worker processes
+        '''
+        self._create_stores()
+
+        if workers > 1 :
+            if settings.store_chain.generation_mode == 'columnar' :
+                await self._create_day_in_pool(workers=workers, by_cash_regs=by_cash_regs)
+                return
+            log.logger.warning(f'The worker processes are only used in the columnar generation mode, '
+                               f'the sales will be generated in the current process.')
+
         # Creating tasks for async run processes of creating sales for each store
         async with asyncio.TaskGroup() as tg :
             tasks = []
@@ -276,9 +734,74 @@ class ChainStores :
             task.result()
 
 
-    async def save_day(self) :
+    async def _create_day_in_pool(self, workers: int, by_cash_regs: bool) :
+        '''
+        Creating the sales of all stores on the pool of worker processes (the columnar mode).
+        The workers return the compact columnar buffers (SalesColumns) instead of the objects graphs.
+        :param workers: the number of worker processes
+        :param by_cash_regs: the flag for distributing cash registers (not whole stores) between the worker processes
+        '''
+        log.logger.debug(f'The sales will be generated on the pool of {workers} worker processes '
+                         f'(the unit of work is {"a cash register" if by_cash_regs else "a store"}).')
+        loop = asyncio.get_running_loop()
+
+        with ProcessPoolExecutor(max_workers=workers) as pool :
+            if by_cash_regs :
+                futures = [
+                    [loop.run_in_executor(pool, create_cash_reg_sales, d) for d in s.get_cash_reg_days()]
+                    for s in self._stores
+                ]
+            else :
+                futures = [
+                    [loop.run_in_executor(pool, create_store_sales, s.get_cash_reg_days())]
+                    for s in self._stores
+                ]
+            results = await asyncio.gather(*[asyncio.gather(*f) for f in futures])
+
+        for s, store_sales in zip(self._stores, results) :
+            s.set_sales(SalesColumns.concat(store_sales))
+
+
+    async def stream_day(self, path_save: str = settings.sales_storing_path, workers: int = 1) -> int :
+        '''
+        Creating and saving the sales of all stores in the streaming mode: the sales of each cash register are
+        generated, post-processed, saved to its own file and released, so the peak memory doesn't depend
+        on the size of the store chain (the columnar mode only).
+        :param path_save: the path to save
+        :param workers: the number of worker processes (each of them saves its own cash registers)
+        :return: the number of saved receipt lines
+        '''
+        _check_path(path_save=path_save)
+        self._create_stores()
+
+        cash_reg_days = (d for s in self._stores for d in s.get_cash_reg_days())
+        if workers > 1 :
+            loop = asyncio.get_running_loop()
+            with ProcessPoolExecutor(max_workers=workers) as pool :
+                results = await asyncio.gather(
+                    *[loop.run_in_executor(pool, stream_cash_reg_day, d, path_save) for d in cash_reg_days]
+                )
+        else :
+            results = [stream_cash_reg_day(cash_reg_day=d, path_save=path_save) for d in cash_reg_days]
+
+        # A day without cash registers gives no results (nothing to unpack)
+        lines, receipts, collisions = map(sum, zip(*results)) if results else (0, 0, 0)
+        log.logger.debug(f'{lines} receipt lines of {len(results)} cash registers have been saved '
+                         f'in the streaming mode.')
+        log_collisions(receipts=receipts, collisions=collisions)
+        return lines
+
+
+    async def save_day(self, path_save: str = settings.sales_storing_path) :
+
+        _check_path(path_save=path_save)
 
-        _check_path(path_save=settings.sales_storing_path)
+        # Checking the uniqueness of the receipt IDs (a chain without stores gives no counts - nothing to unpack)
+        counts = [s.get_sales_columns().count_collisions() for s in self._stores]
+        receipts, collisions = map(sum, zip(*counts)) if counts else (0, 0)
+        log_collisions(receipts=receipts, collisions=collisions)
+        if not counts :
+            return
 
         async with asyncio.TaskGroup() as tg :
             tasks = []
@@ -292,10 +815,10 @@ class ChainStores :
         df = post_process_df(df)
 
         # Saving all sales data in one file (for debugging)
-        # _save_to_csv(df=df, path_save=settings.sales_storing_path, name='temp.csv')
+        # _save_to_csv(df=df, path_save=path_save, name='temp.csv')
 
         # Saving sales data for stores and cash registers (for production)
-        save_by_units(df=df, path_save=settings.sales_storing_path)
+        save_by_units(df=df, path_save=path_save)
 
         return
 
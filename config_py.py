@@ -1,6 +1,7 @@
 # A module for processing application settings.
 
 from pathlib import Path, PurePath
+from typing import Literal
 from pydantic import BaseModel, Field, PositiveInt, computed_field
 import logging
 
@@ -17,6 +18,8 @@ class DBConnectionSettings(BaseModel) :
     dbname: str = Field(default='household_goods_chain', description='connection data base name')
     user: str = Field(default='postgres', description='connection user')
     password: str = Field(default='123456', description='connection password')
+    pool_size: PositiveInt = Field(default=4, description='the maximum number of connections in the pool '
+                                                          '(the number of concurrent uploads)')
 
 class LogCommonSettings(BaseModel) :
     level: str = Field(default='INFO', description='level of logging')
@@ -53,12 +56,19 @@ class DiscountsSettings(BaseModel) :
     discounts_values: list[float] = Field(description='available values of discounts')
     discounts_probs: list[float] = Field(description='values of the probabilities of occurrence of each discount')
 
+class PopularitySettings(BaseModel) :
+    zipf_exponent: float = Field(default=0.0, ge=0, description='the exponent of the Zipf-like popularity of the '
+                                                                'products inside the category (0 - all products '
+                                                                'are equally popular)')
+
 class GoodsSettings(BaseModel) :
     categories: list[str] = Field(description='the number of cash registers for each store in the chain of stores')
     name_prefix: list[str] = Field(description='the store`s rating by popularity among customers in the store chain')
     category_capacity: list[int] = Field(description='opening hours of each store in the chain of stores')
     price_distribution: PriceDistributionsSettings =  Field(description='settings of the goods prices')
     discounts: DiscountsSettings = Field(description='settings of the discounts')
+    popularity: PopularitySettings = Field(default_factory=PopularitySettings,
+                                           description='settings of the popularity of the goods')
 
 class StuffSettings(BaseModel) :
     range_of_manager_salary: list[int] = Field(description='the range of managers\' salaries')
@@ -72,12 +82,47 @@ class StoreChainSettings(BaseModel) :
     range_of_chain_daily_load: list[float] = Field(description='the range of loads on the retail network of stores')
     range_of_cash_regs_daily_load: list[float] = Field(description='the range of cash registers loads')
     min_sec_per_cash_transaction: int = Field(default=120, gt=0, description='minimum time per cash transaction')
+    generation_mode: Literal['objects', 'columnar'] = Field(default='columnar',
+                                                            description='the way of generating the receipts')
+
+class UploadSettings(BaseModel) :
+    method: Literal['insert', 'copy', 'merge'] = Field(default='copy',
+                                                       description='the way of loading rows into the database: '
+                                                                   '"insert" - row by row, "copy" - bulk loading '
+                                                                   'with the COPY command, "merge" - bulk loading '
+                                                                   'of the raw files into the staging table and '
+                                                                   'set-based merging by the database')
+    copy_format: Literal['csv', 'binary'] = Field(default='binary',
+                                                  description='the format of the data sent by the COPY command '
+                                                              '(the "copy" method): "csv" - the text of the data frame, '
+                                                              '"binary" - encoded straight from the column arrays')
+    batch_size: PositiveInt = Field(default=10000, description='the number of rows committed at once by the row by row '
+                                                              'insertion (the "insert" method)')
+    backend: Literal['sync', 'async'] = Field(default='sync',
+                                              description='the database driver of the uploader: "sync" - psycopg2, '
+                                                          '"async" - psycopg 3 (the files are parsed and uploaded '
+                                                          'concurrently, is not used by the "merge" method)')
+    claim_timeout: PositiveInt = Field(default=60, description='the time in minutes after which the files claimed '
+                                                               'by another run of the uploader (an interrupted one) '
+                                                               'are claimed again')
 
 class AppSettings(BaseModel):
     database_connection: DBConnectionSettings = Field(description='data base connection settings')
     logging: LogSettings = Field(description='logging settings')
+    upload: UploadSettings = Field(default_factory=UploadSettings, description='settings of uploading sales data')
     store_chain: StoreChainSettings = Field(description='settings for the retail chain of stores')
     sales_storing_path: str = Field(default='data', description='folder for storing sales data')
+    sales_format: Literal['csv', 'parquet', 'arrow'] = Field(default='csv', description='format of sales data files')
+    sales_archive_path: str = Field(default='archive', description='folder for archiving the uploaded sales data files')
+    goods_catalog_path: str = Field(default='', description='folder for storing the goods catalog snapshots '
+                                                            '(empty - the catalog is built at every run)')
+    dimension_cache_path: str = Field(default='', description='folder for the local copies of the dimension tables '
+                                                              'used by the uploader (empty - they are read at every run)')
+    receipt_key: Literal['varchar', 'bigint'] = Field(default='bigint',
+                                                      description='the type of the receipt key in the database: '
+                                                                  '"bigint" - the store, the cash register and the time '
+                                                                  'packed into a number (the receipt ID is kept in the '
+                                                                  '"receipt_code" column), "varchar" - the receipt ID')
 
 
 dir_name = PurePath(__file__).parent
@@ -1,7 +1,10 @@
 # A module for the regular formation of the history of our network of stores.
 
+import argparse
 import asyncio
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
+from pathlib import PurePath
 
 from config_py import settings
 import logger as log
@@ -12,44 +15,142 @@ from chain_stores import ChainStores
 log.logger = set_logger(log_common_set=settings.logging.common, log_specific_set=settings.logging.generating)
 
 
-async def main() :
+def get_args() -> argparse.Namespace :
     '''
-    The main function of this module
+    Parsing the command line arguments
+    :return: the namespace of the arguments
+    '''
+    parser = argparse.ArgumentParser(description='The generator of the day`s sales of the store chain.')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='the number of worker processes for generating sales (default: 1)')
+    parser.add_argument('--by-cash-regs', action='store_true',
+                        help='distribute cash registers (not whole stores) between the worker processes')
+    parser.add_argument('--stream', action='store_true',
+                        help='save the sales of each cash register as soon as they are generated '
+                             '(the peak memory doesn\'t depend on the size of the store chain)')
+    parser.add_argument('--from', dest='date_from', type=datetime.fromisoformat, default=None,
+                        help='the first day of the backfill mode (YYYY-MM-DD), the days are generated in parallel '
+                             'on the worker processes and saved in the subfolders of the sales storing folder')
+    parser.add_argument('--to', dest='date_to', type=datetime.fromisoformat, default=None,
+                        help='the last day of the backfill mode (YYYY-MM-DD, default: yesterday)')
+    args = parser.parse_args()
+
+    if args.date_to is not None and args.date_from is None :
+        parser.error('the argument --to requires the argument --from')
+    if args.date_from is not None :
+        if args.date_to is None :
+            args.date_to = datetime.now() - timedelta(days=1)
+        if args.date_to < args.date_from :
+            parser.error('the last day of the backfill is earlier than the first one')
+
+    return args
+
+
+async def generate_day(operating_date: datetime,
+                       path_save: str,
+                       workers: int = 1,
+                       by_cash_regs: bool = False,
+                       stream: bool = False) -> bool :
+    '''
+    Generating and saving the sales of one day
+    :param operating_date: the day of sales
+    :param path_save: the path to save sales files
+    :param workers: the number of worker processes for generating sales
+    :param by_cash_regs: the flag for distributing cash registers (not whole stores) between the worker processes
+    :param stream: the flag of the streaming mode (each cash register is saved as soon as it is generated)
+    :return: a boolean value is an indicator that the sales have been generated (False - for a day off)
     '''
-    # await set_logger(log_set=settings.logging_generating)
-    log.logger.info('The generator of the day`s sales was started.')
-
-    time_start = datetime.now()
-    operating_date = time_start - timedelta(days=1)
-
     log.logger.info(f'Operating date: {operating_date.date()}')
 
     # Checking for a day off
     if operating_date.weekday() == 6 :
         log.logger.info(f'It\'s a day off, so there\'s no sales data.')
-        return
+        return False
 
-    # Basic operations
-    # await asyncio.sleep(0.01)
     chain_stores = ChainStores(chain_settings=settings.store_chain, processing_day=operating_date)
-    await chain_stores.create_day()
-    await chain_stores.save_day()
 
-    # pass
+    if stream :
+        if settings.store_chain.generation_mode == 'columnar' :
+            await chain_stores.stream_day(path_save=path_save, workers=workers)
+            return True
+        log.logger.warning(f'The streaming mode is only used in the columnar generation mode, '
+                           f'the sales will be saved after generating the whole day.')
+
+    await chain_stores.create_day(workers=workers, by_cash_regs=by_cash_regs)
+    await chain_stores.save_day(path_save=path_save)
+
+    return True
+
+
+def _run_generate_day(operating_date: datetime, path_save: str, stream: bool) -> bool :
+    '''
+    Generating the sales of one day in a worker process of the backfill mode
+    (the goods catalog is built once per worker process and reused for all its days)
+    '''
+    return asyncio.run(generate_day(operating_date=operating_date, path_save=path_save, stream=stream))
+
+
+async def backfill(date_from: datetime, date_to: datetime, workers: int = 1, stream: bool = False) -> int :
+    '''
+    Generating the sales history for the range of days, each day is saved in its own subfolder
+    of the sales storing folder (<sales_storing_path>/YYYY-MM-DD)
+    :param date_from: the first day of the range
+    :param date_to: the last day of the range
+    :param workers: the number of worker processes (the days are distributed between them)
+    :param stream: the flag of the streaming mode (each cash register is saved as soon as it is generated)
+    :return: the number of generated days
+    '''
+    days = [date_from + timedelta(days=i) for i in range((date_to - date_from).days + 1)]
+    paths = [PurePath(settings.sales_storing_path, d.strftime('%Y-%m-%d')).as_posix() for d in days]
+    log.logger.info(f'The backfill mode: {len(days)} days from {date_from.date()} to {date_to.date()} '
+                    f'on {workers} worker process(es).')
+
+    if workers > 1 :
+        loop = asyncio.get_running_loop()
+        with ProcessPoolExecutor(max_workers=workers) as pool :
+            results = await asyncio.gather(
+                *[loop.run_in_executor(pool, _run_generate_day, d, p, stream) for d, p in zip(days, paths)]
+            )
+    else :
+        results = [await generate_day(operating_date=d, path_save=p, stream=stream) for d, p in zip(days, paths)]
+
+    return sum(results)
+
+
+async def main(workers: int = 1,
+               by_cash_regs: bool = False,
+               stream: bool = False,
+               date_from: datetime | None = None,
+               date_to: datetime | None = None) :
+    '''
+    The main function of this module
+    :param workers: the number of worker processes for generating sales
+    :param by_cash_regs: the flag for distributing cash registers (not whole stores) between the worker processes
+    :param stream: the flag of the streaming mode (each cash register is saved as soon as it is generated)
+    :param date_from: the first day of the backfill mode (None - only yesterday is generated)
+    :param date_to: the last day of the backfill mode
+    '''
+    log.logger.info('The generator of the day`s sales was started.')
+
+    time_start = datetime.now()
 
-    # try :
-    #
-    # except Exception as e :
-    #     logger.error(f'Error: {e}')
-    #     return False
+    if date_from is not None :
+        days = await backfill(date_from=date_from, date_to=date_to, workers=workers, stream=stream)
+        log.logger.info(f'The backfill of {days} days was completed, '
+                        f'execution time - {(datetime.now() - time_start).total_seconds():.2f} seconds.')
+        return
 
-    log.logger.info(f'The generator of the day`s sales was completed, '
-                f'execution time - {(datetime.now() - time_start).total_seconds():.2f} seconds.')
+    # Basic operations
+    if await generate_day(operating_date=time_start - timedelta(days=1),
+                          path_save=settings.sales_storing_path,
+                          workers=workers,
+                          by_cash_regs=by_cash_regs,
+                          stream=stream) :
+        log.logger.info(f'The generator of the day`s sales was completed, '
+                        f'execution time - {(datetime.now() - time_start).total_seconds():.2f} seconds.')
 
-    # await asyncio.sleep(0.1)
     return
 
 
 if __name__ == '__main__':
-    asyncio.run(main())
-
+    asyncio.run(main(**vars(get_args())))
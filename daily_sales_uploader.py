@@ -1,10 +1,17 @@
 # A module for regularly uploading the history of our store chain to the postgresql database.
 
 import asyncio
-from datetime import datetime
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+import numpy as np
 import pandas as pd
 import re
+import sys
 from pathlib import Path, PurePath
+from time import perf_counter
+from typing import Iterator
+from uuid import uuid4
 
 from config_py import settings, dir_name
 import logger as log
@@ -12,13 +19,255 @@ from logger import set_logger
 
 log.logger = set_logger(log_common_set=settings.logging.common, log_specific_set=settings.logging.uploading)
 
-from pgdb import Database, Rows, DBQueryResult
+from pgdb import Database, DatabasePool, DimensionCache, DBQueryResult, get_row_key, iter_frame_rows
+from apgdb import AsyncDatabase, AsyncDatabasePool
 from exceptions import AppDBError
 from app_types import DBReceipt, DBReceiptLine
 from sql.summary_query import SUMMARY_QUERY
+from sql.merge_query import (STAGING_TABLE, STAGING_FIELDS, STAGING_CREATE_QUERY, STAGING_CLEAR_QUERY,
+                             STAGING_COUNT_QUERY, STAGING_REJECT_QUERY, MERGE_PARTITION_QUERY, MERGE_RECEIPT_QUERY,
+                             MERGE_RECEIPT_LINE_QUERY, MERGE_RECEIPT_KEY_QUERY, MERGE_RECEIPT_LINE_KEY_QUERY,
+                             MERGE_ROLLUP_QUERY)
+from sql.partition_query import PARTITION_CREATE_QUERY
+from sql.rollup_query import ROLLUP_TABLE, ROLLUP_CREATE_QUERY, ROLLUP_DAYS_QUERY, ROLLUP_BACKFILL_QUERY
+from sql.ledger_query import (LEDGER_TABLE, LEDGER_CREATE_QUERY, LEDGER_DONE_QUERY, LEDGER_CLAIM_QUERY,
+                              LEDGER_MARK_QUERY, LEDGER_RUN_DONE_QUERY)
+from sql.progress_query import PROGRESS_CREATE_QUERY, PROGRESS_READ_QUERY, PROGRESS_SAVE_QUERY, PROGRESS_DELETE_QUERY
+from gen_utils import RECEIPT_STAMP_LEN, read_sales_file, concat_sales, pack_receipt_keys
 
 
-async def receipts_upload(db: Database, df: pd.DataFrame) -> bool:
+# The lookups of the dimension tables: <name>: (<table name>, <key column>, <value column>)
+LOOKUPS = {
+    'store_id' : ('cash_register', 'cr_receipt_code', 'store_id'),
+    'cash_reg_id' : ('cash_register', 'cr_receipt_code', 'id'),
+    'item_id' : ('goods', 'item_name', 'id'),
+}
+
+_lookups: dict[str, pd.Series] = {}     # Global variable for the lookups loaded once per run
+
+# The fields of the main tables: with the bigint receipt key the receipt ID is kept in the secondary column
+RECEIPT_FIELDS = DBReceipt._fields + (('receipt_code',) if settings.receipt_key == 'bigint' else ())
+RECEIPT_LINE_FIELDS = DBReceiptLine._fields
+
+
+def load_lookups(db: Database) -> bool:
+    '''
+    Loading the lookups of the dimension tables (the cash register and the goods directories) through the local cache:
+    the unchanged dimension tables are not read from the database again
+    :param db: the instance of the Database class
+    :return: a boolean value is an indicator of the operation's success.
+    '''
+    path = PurePath.joinpath(dir_name, settings.dimension_cache_path) if settings.dimension_cache_path else None
+    cache = DimensionCache(db=db, path=path)
+
+    # The columns of each dimension table (the ID column goes first)
+    columns = {}
+    for table_name, key_column, value_column in LOOKUPS.values() :
+        columns.setdefault(table_name, ['id'])
+        columns[table_name] += [c for c in (key_column, value_column) if c not in columns[table_name]]
+
+    for table_name, table_columns in columns.items() :
+        df = cache.read(table_name=table_name, columns=tuple(table_columns))
+        if df is None :
+            log.logger.error(f'Database operation error: couldn\'t read the "{table_name}" directory.')
+            return False
+        for name, (lookup_table, key_column, value_column) in LOOKUPS.items() :
+            if lookup_table == table_name :
+                # The last of the repeated keys wins (as in a dict.)
+                df_lookup = df.drop_duplicates(key_column, keep='last')
+                _lookups[name] = pd.Series(df_lookup[value_column].to_numpy(), index=df_lookup[key_column].to_numpy())
+
+    return True
+
+
+def get_cash_reg_codes(doc_ids: pd.Series) -> pd.Series:
+    ''' Cutting out the store/cashier's identification code from the receipt IDs (the ID without its time) '''
+    return doc_ids.str[:-RECEIPT_STAMP_LEN]
+
+
+def get_receipt_keys(doc_ids: pd.Series, receipt_times: pd.Series) -> np.ndarray:
+    '''
+    Getting the bigint receipt keys (the "receipt_key" setting) - the packed store, cash register and time
+    of the receipts (the lookups must be loaded by the "load_lookups" function)
+    :param doc_ids: the receipt IDs
+    :param receipt_times: the time of the receipts (parsed)
+    :return: the array of the receipt keys
+    '''
+    # The codes are decoded once per receipt, not per line
+    codes, uniques = pd.factorize(doc_ids)
+    cr_receipt_codes = get_cash_reg_codes(pd.Series(uniques))
+    store_ids = cr_receipt_codes.map(_lookups['store_id'])
+    cash_reg_ids = cr_receipt_codes.map(_lookups['cash_reg_id'])
+    if store_ids.isna().any() :
+        raise AppDBError(f'Unknown store/cashier\'s identification codes: '
+                         f'{", ".join(cr_receipt_codes[store_ids.isna()].unique())}.')
+
+    return pack_receipt_keys(store_ids.to_numpy()[codes], cash_reg_ids.to_numpy()[codes], receipt_times.to_numpy())
+
+
+def get_receipts(df: pd.DataFrame) -> pd.DataFrame:
+    '''
+    Preparing the receipts for uploading (the lookups must be loaded by the "load_lookups" function)
+    :param df: the data frame for processing
+    :return: the data frame with the fields of the "receipt" table (RECEIPT_FIELDS)
+    '''
+    # Getting a list of receipts and their time (all lines of the receipt have the same time, so it's enough
+    # to drop the duplicates instead of the much slower grouping by the string receipt ID)
+    df_rc = df.drop_duplicates('doc_id')[['doc_id', 'receipt_time']].sort_values('doc_id').reset_index(drop=True)
+
+    # Cutting out the store/cashier's identification code from the receipt ID.
+    df_rc['cr_receipt_code'] = get_cash_reg_codes(df_rc['doc_id'])
+
+    # Decoding the store and the cash register IDs by the store/cashier's identification code
+    df_rc['store_id'] = df_rc['cr_receipt_code'].map(_lookups['store_id'])
+    df_rc['cash_reg_id'] = df_rc['cr_receipt_code'].map(_lookups['cash_reg_id'])
+
+    # The receipt key is the receipt ID itself or the packed bigint key (with the receipt ID kept as the receipt code)
+    if settings.receipt_key == 'bigint' :
+        df_rc['id'] = get_receipt_keys(df_rc['doc_id'], df_rc['receipt_time'])
+        df_rc['receipt_code'] = df_rc['doc_id']
+    else :
+        df_rc['id'] = df_rc['doc_id']
+
+    return df_rc[list(RECEIPT_FIELDS)]
+
+
+def get_receipt_lines(df: pd.DataFrame) -> pd.DataFrame:
+    '''
+    Preparing the receipt lines for uploading (the lookups must be loaded by the "load_lookups" function)
+    :param df: the data frame for processing
+    :return: the data frame with the fields of the "receipt_line" table
+    '''
+    df_rcl = df.copy()
+    # Numbering the lines inside the receipts
+    df_rcl['id_line'] = df_rcl.groupby(['doc_id']).cumcount() + 1
+
+    # Getting the product ID by its name (an unknown product gets an empty ID - it fails only its own partition,
+    # the categories of the "item" field are shared by all the partitions)
+    df_rcl['id_item'] = df_rcl['item'].map(_lookups['item_id']).astype('Int32')
+
+    # The lines refer to the receipts by their key
+    if settings.receipt_key == 'bigint' :
+        df_rcl['doc_id'] = get_receipt_keys(df_rcl['doc_id'], df_rcl['receipt_time'])
+
+    return df_rcl[['id_line', 'doc_id', 'receipt_time', 'id_item', 'amount']]
+
+
+def get_partition_days(df: pd.DataFrame) -> tuple[date, date]:
+    ''' Getting the first and the last day of the sales (the partitions of the main tables are created for them) '''
+    return df['receipt_time'].min().date(), df['receipt_time'].max().date()
+
+
+def log_partitions(res: DBQueryResult) -> bool:
+    '''
+    Logging the creation of the partitions of the main tables
+    :param res: the result of the query creating the partitions
+    :return: a boolean value is an indicator of the operation's success.
+    '''
+    if not res.is_successful :
+        log.logger.error(f'Database operation error: couldn\'t create the partitions of the main tables.')
+        return False
+    created = res.value[0][0]
+    if created :
+        log.logger.info(f'{created} day partitions of the main tables have been created.')
+    return True
+
+
+def log_rollup(res: DBQueryResult) -> bool:
+    '''
+    Logging the refresh of the daily sales rollup
+    :param res: the result of the query refreshing the rollup
+    :return: a boolean value is an indicator of the operation's success.
+    '''
+    if not res.is_successful :
+        log.logger.error(f'Database operation error: couldn\'t refresh the daily sales rollup "{ROLLUP_TABLE}".')
+        return False
+    log.logger.debug(f'{res.value} rows of the daily sales rollup "{ROLLUP_TABLE}" have been refreshed.')
+    return True
+
+
+def get_receipt_rows(df_rc: pd.DataFrame) -> Iterator[tuple]:
+    ''' Feeding the prepared receipts to the row by row insertion (in the order of the RECEIPT_FIELDS) '''
+    return iter_frame_rows(df_rc)
+
+
+def get_receipt_line_rows(df_rcl: pd.DataFrame) -> Iterator[tuple]:
+    ''' Feeding the prepared receipt lines to the row by row insertion (in the order of the RECEIPT_LINE_FIELDS) '''
+    return iter_frame_rows(df_rcl)
+
+
+# SQL queries with a note about skipping insertion in case of conflict of repetition of the primary key value.
+RECEIPT_INSERT_QUERY = (f"INSERT INTO receipt ({', '.join(RECEIPT_FIELDS)}) "
+                        f"VALUES ({', '.join(['%s'] * len(RECEIPT_FIELDS))}) ON CONFLICT DO NOTHING ")
+RECEIPT_LINE_INSERT_QUERY = (f"INSERT INTO receipt_line ({', '.join(RECEIPT_LINE_FIELDS)}) "
+                             f"VALUES ({', '.join(['%s'] * len(RECEIPT_LINE_FIELDS))}) ON CONFLICT DO NOTHING ")
+
+
+def get_batch_source(table_name: str, df: pd.DataFrame) -> str:
+    ''' Getting the source of the batched uploading: the table name and the fingerprint of the prepared data '''
+    fingerprint = hashlib.sha1(pd.util.hash_pandas_object(df, index=False).to_numpy()).hexdigest()
+    return f'{table_name}:{fingerprint}'
+
+
+def get_resume_start(res: DBQueryResult, source: str, df: pd.DataFrame, key_len: int) -> int:
+    '''
+    Getting the row to resume the batched uploading of the same data from
+    :param res: the result of reading the saved progress of the source
+    :param source: the source of the batched uploading
+    :param df: the prepared data being uploaded
+    :param key_len: the number of the first fields of the row that make its key
+    :return: the number of the rows committed earlier (0 - the uploading is started from the beginning)
+    '''
+    if not res.is_successful or len(res.value) == 0 :
+        return 0
+    start, last_key = res.value[0]
+    # The saved progress is used only if the last committed row is still at the same place
+    if 0 < start <= len(df) and get_row_key(next(iter_frame_rows(df.iloc[start-1 : start])), key_len) == last_key :
+        log.logger.info(f'The uploading of "{source}" is resumed from the row {start}.')
+        return start
+    return 0
+
+
+def batched_insert(db: Database, query: str, rows: Iterator[tuple], df: pd.DataFrame, source: str,
+                   key_len: int) -> DBQueryResult:
+    '''
+    Row by row insertion in batches (a commit per batch), resumable from the last committed batch
+    of the interrupted uploading of the same data
+    :param db: the instance of the Database class
+    :param query: the insertion query
+    :param rows: the rows being uploaded (fed from the prepared data)
+    :param df: the prepared data being uploaded
+    :param source: the source of the batched uploading (see the "get_batch_source" function)
+    :param key_len: the number of the first fields of the row that make its key
+    :return: the instance of the DBQueryResult class with the number of the inserted rows
+    '''
+    start = get_resume_start(db.run_query(PROGRESS_READ_QUERY, (source,)), source, df, key_len)
+    res = db.run_batches(
+        query=query, params=rows, batch_size=settings.upload.batch_size, start=start, key_len=key_len,
+        progress_query=PROGRESS_SAVE_QUERY, progress_params=(source,)
+    )
+    if res.is_successful :
+        db.run_query(PROGRESS_DELETE_QUERY, (source,))
+    return DBQueryResult(res.is_successful, res.value.affected)
+
+
+async def async_batched_insert(db: AsyncDatabase, query: str, rows: Iterator[tuple], df: pd.DataFrame, source: str,
+                               key_len: int) -> DBQueryResult:
+    '''
+    Row by row insertion in batches on the asynchronous driver (see the "batched_insert" function)
+    :return: the instance of the DBQueryResult class with the number of the inserted rows
+    '''
+    start = get_resume_start(await db.run_query(PROGRESS_READ_QUERY, (source,)), source, df, key_len)
+    res = await db.run_batches(
+        query=query, params=rows, batch_size=settings.upload.batch_size, start=start, key_len=key_len,
+        progress_query=PROGRESS_SAVE_QUERY, progress_params=(source,)
+    )
+    if res.is_successful :
+        await db.run_query(PROGRESS_DELETE_QUERY, (source,))
+    return DBQueryResult(res.is_successful, res.value.affected)
+
+
+def receipts_upload(db: Database, df: pd.DataFrame) -> bool:
     '''
     Uploading receipts to the database
     :param db: the instance of the Database class
@@ -26,41 +275,21 @@ async def receipts_upload(db: Database, df: pd.DataFrame) -> bool:
     :return: a boolean value is an indicator of the operation's success.
     '''
     try:
-        # Getting a list of receipts and their time
-        df_rc = df.groupby('doc_id')['receipt_time'].min().reset_index()
-
-        # Cutting out the store/cashier's identification code from the receipt ID.
-        df_rc['cr_receipt_code'] = df_rc['doc_id'].str[:2]
-
-        # Reading the cash register directory from the postgres database
-        res = db.read_rows(table_name='cash_register', columns_statement='id, store_id, cr_receipt_code')
-        if not res.is_successful :
-            raise AppDBError('Database operation error: couldn\'t read "cash registers" list.')
-
-        # Creating a dict. with decoding <cr_receipt_code>: <key> - cr_receipt_code, <value> - store_id
-        store_dict = {_[2] : _[1] for _ in res.value}
-        df_rc['store_id'] = df_rc['cr_receipt_code'].map(store_dict)
-
-        # Creating a dict. with decoding <cr_receipt_code>: <key> - cr_receipt_code, <value> - cash_register_id
-        cash_reg_dict = {_[2] : _[0] for _ in res.value}
-        df_rc['cash_reg_id'] = df_rc['cr_receipt_code'].map(cash_reg_dict)
-
-        values: Rows = tuple(
-            DBReceipt(
-                id=rec['doc_id'],
-                receipt_time=rec['receipt_time'],
-                store_id=rec['store_id'],
-                cash_reg_id=rec['cash_reg_id']
-            )
-            for rec in df_rc.to_dict(orient='records')
-        )
-
-        query = f"INSERT INTO receipt VALUES (%s, %s, %s, %s) ON CONFLICT DO NOTHING "
+        df_rc = get_receipts(df=df)
 
-        res = db.run_query(query=query, params=values, several=True)
+        if settings.upload.method == 'copy' :
+            # Bulk loading with skipping insertion in case of conflict of repetition of the primary key value
+            res = db.copy_rows(table_name='receipt', df=df_rc, insert_fields=RECEIPT_FIELDS,
+                               copy_format=settings.upload.copy_format)
+        else :
+            res = batched_insert(
+                db=db, query=RECEIPT_INSERT_QUERY, rows=get_receipt_rows(df_rc), df=df_rc,
+                source=get_batch_source('receipt', df_rc), key_len=1
+            )
 
         if res.is_successful :
-            log.logger.info(f'The sales data have been successfully uploaded to the "receipt" table.')
+            log.logger.debug(f'The sales data have been successfully uploaded to the "receipt" table '
+                             f'({res.value} rows).')
         else :
             raise AppDBError(f'Database operation error: couldn\'t uploaded data to the table "receipt".')
 
@@ -71,7 +300,7 @@ async def receipts_upload(db: Database, df: pd.DataFrame) -> bool:
     return True
 
 
-async def receipt_lines_upload(db: Database, df: pd.DataFrame) -> bool:
+def receipt_lines_upload(db: Database, df: pd.DataFrame) -> bool:
     '''
     Uploading receipt lines to the database
     :param db: the instance of the Database class
@@ -79,35 +308,85 @@ async def receipt_lines_upload(db: Database, df: pd.DataFrame) -> bool:
     :return: a boolean value is an indicator of the operation's success.
     '''
     try:
-        df_rcl = df.copy()
-        # Numbering the lines inside the receipts
-        df_rcl['id_line'] = df_rcl.groupby(['doc_id']).cumcount() + 1
-
-        # Reading the goods directory from the postgres database
-        res = db.read_rows(table_name='goods', columns_statement='id, item_name')
-        if not res.is_successful :
-            raise AppDBError('Database operation error: couldn\'t read "goods" list.')
-
-        # Getting the product ID by its name
-        items_dict = {_[1] : _[0] for _ in res.value}
-        df_rcl['id_item'] = df_rcl['item'].map(items_dict)
-
-        values: Rows = tuple(
-            DBReceiptLine(
-                id=rec['id_line'],
-                id_receipt=rec['doc_id'],
-                id_item=rec['id_item'],
-                amount=rec['amount']
+        df_rcl = get_receipt_lines(df=df)
+
+        if settings.upload.method == 'copy' :
+            # Bulk loading with skipping insertion in case of conflict of repetition of the primary key value
+            res = db.copy_rows(table_name='receipt_line', df=df_rcl, insert_fields=RECEIPT_LINE_FIELDS,
+                               copy_format=settings.upload.copy_format)
+        else :
+            res = batched_insert(
+                db=db, query=RECEIPT_LINE_INSERT_QUERY, rows=get_receipt_line_rows(df_rcl), df=df_rcl,
+                source=get_batch_source('receipt_line', df_rcl), key_len=2
             )
-            for rec in df_rcl.to_dict(orient='records')
-        )
-        # SQL query with a note about skipping insertion in case of conflict of repetition of the primary key value.
-        query = f"INSERT INTO receipt_line VALUES (%s, %s, %s, %s) ON CONFLICT DO NOTHING "
 
-        res = db.run_query(query=query, params=values, several=True)
+        if res.is_successful :
+            log.logger.debug(f'The sales data have been successfully uploaded to the "receipt_line" table '
+                             f'({res.value} rows).')
+        else :
+            raise AppDBError(f'Database operation error: couldn\'t uploaded data to the table "receipt_line".')
+
+    except Exception as e:
+        log.logger.error(f'Error: {e}')
+        return False
+
+    return True
+
+
+async def async_receipts_upload(db: AsyncDatabase, df: pd.DataFrame) -> bool:
+    '''
+    Uploading receipts to the database (on the asynchronous driver)
+    :param db: the instance of the AsyncDatabase class
+    :param df: the data frame for processing
+    :return: a boolean value is an indicator of the operation's success.
+    '''
+    try:
+        df_rc = get_receipts(df=df)
+
+        if settings.upload.method == 'copy' :
+            res = await db.copy_rows(table_name='receipt', df=df_rc, insert_fields=RECEIPT_FIELDS,
+                                     copy_format=settings.upload.copy_format)
+        else :
+            res = await async_batched_insert(
+                db=db, query=RECEIPT_INSERT_QUERY, rows=get_receipt_rows(df_rc), df=df_rc,
+                source=get_batch_source('receipt', df_rc), key_len=1
+            )
+
+        if res.is_successful :
+            log.logger.debug(f'The sales data have been successfully uploaded to the "receipt" table '
+                             f'({res.value} rows).')
+        else :
+            raise AppDBError(f'Database operation error: couldn\'t uploaded data to the table "receipt".')
+
+    except Exception as e:
+        log.logger.error(f'Error: {e}')
+        return False
+
+    return True
+
+
+async def async_receipt_lines_upload(db: AsyncDatabase, df: pd.DataFrame) -> bool:
+    '''
+    Uploading receipt lines to the database (on the asynchronous driver)
+    :param db: the instance of the AsyncDatabase class
+    :param df: the data frame for processing
+    :return: a boolean value is an indicator of the operation's success.
+    '''
+    try:
+        df_rcl = get_receipt_lines(df=df)
+
+        if settings.upload.method == 'copy' :
+            res = await db.copy_rows(table_name='receipt_line', df=df_rcl, insert_fields=RECEIPT_LINE_FIELDS,
+                                     copy_format=settings.upload.copy_format)
+        else :
+            res = await async_batched_insert(
+                db=db, query=RECEIPT_LINE_INSERT_QUERY, rows=get_receipt_line_rows(df_rcl), df=df_rcl,
+                source=get_batch_source('receipt_line', df_rcl), key_len=2
+            )
 
         if res.is_successful :
-            log.logger.info(f'The sales data have been successfully uploaded to the "receipt_line" table.')
+            log.logger.debug(f'The sales data have been successfully uploaded to the "receipt_line" table '
+                             f'({res.value} rows).')
         else :
             raise AppDBError(f'Database operation error: couldn\'t uploaded data to the table "receipt_line".')
 
@@ -118,40 +397,324 @@ async def receipt_lines_upload(db: Database, df: pd.DataFrame) -> bool:
     return True
 
 
-async def read_operation_day() -> pd.DataFrame:
+def upload_partition(pool: DatabasePool, df: pd.DataFrame) -> bool:
+    '''
+    Uploading one partition of the sales (the sales of one cash register) on its own connection from the pool
+    :param pool: the instance of the DatabasePool class
+    :param df: the data frame of the partition
+    :return: a boolean value is an indicator of the operation's success.
+    '''
+    with pool.database() as db :
+        # The receipt lines refer to the receipts, so the receipts of the partition are uploaded first
+        return receipts_upload(db=db, df=df) and receipt_lines_upload(db=db, df=df)
+
+
+async def concurrent_upload(pool: DatabasePool, df: pd.DataFrame) -> dict[Path, bool]:
     '''
-    The function of file processing of generated sales data for each cash register of each store
-    :return: a data frame with all sales for further processing
+    Concurrent uploading of the sales: the partitions (cash registers) are independent of each other,
+    so they are uploaded in parallel threads - each on its own connection from the pool
+    :param pool: the instance of the DatabasePool class
+    :param df: the data frame for processing (read by the "read_operation_day" function)
+    :return: the dict. with the success indicator of each data file (the first level of the data frame index)
     '''
-    df = pd.DataFrame()
+    pool_size = settings.database_connection.pool_size
+    # The cash register is encoded by the receipt ID without its time
+    partitions = [df_part for _, df_part in df.groupby(get_cash_reg_codes(df['doc_id']), sort=False)]
+
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=pool_size) as executor :
+        results = await asyncio.gather(
+            *(loop.run_in_executor(executor, upload_partition, pool, df_part) for df_part in partitions)
+        )
+    log.logger.info(f'{results.count(True)} of {len(partitions)} partitions of the sales data have been successfully '
+                    f'uploaded on {pool_size} connections.')
+
+    # The data file is uploaded if the partition of its cash register is uploaded
+    return {
+        path : is_successful
+        for df_part, is_successful in zip(partitions, results)
+        for path in df_part.index.unique(level=0)
+    }
+
+
+async def async_upload_file(pool: AsyncDatabasePool, path: Path, days: list[tuple[date, date]],
+                            slots: asyncio.Semaphore) -> bool:
+    '''
+    Uploading the sales data file of one cash register on the asynchronous driver. The file is parsed
+    in a separate thread, so the parsing of one file overlaps with the uploading of the others.
+    :param pool: the instance of the AsyncDatabasePool class
+    :param path: the sales data file
+    :param days: the list collecting the first and the last day of the sales of the files
+    :param slots: the semaphore limiting the number of the files being parsed or uploaded at once
+                  (the parsed files waiting for a connection are kept in memory)
+    :return: a boolean value is an indicator of the operation's success.
+    '''
+    async with slots :
+        try :
+            log.logger.debug(f'Reading data file: {path}.')
+            df = await asyncio.to_thread(read_sales_file, path)
+        except Exception as e :
+            log.logger.error(f'An error has occurred: {e}')
+            return False
+
+        partition_days = get_partition_days(df)
+        days.append(partition_days)
+        async with pool.database() as db :
+            if not log_partitions(await db.run_query(PARTITION_CREATE_QUERY, partition_days)) :
+                return False
+            # The receipt lines refer to the receipts, so the receipts of the file are uploaded first
+            return await async_receipts_upload(db=db, df=df) and await async_receipt_lines_upload(db=db, df=df)
+
+
+async def async_upload(list_files: list[Path], days: list[tuple[date, date]]) -> dict[Path, bool]:
+    '''
+    Concurrent uploading of the sales data files on the asynchronous driver: as many files are uploaded
+    at once as there are connections in the pool, and as many files again are parsed in advance.
+    :param list_files: the list of the sales data files
+    :param days: the list collecting the first and the last day of the sales of the files
+    :return: the dict. with the success indicator of each data file
+    '''
+    pool: AsyncDatabasePool = await AsyncDatabasePool.create(settings.database_connection)
+    if not pool.is_connected :
+        await pool.close_pool()
+        return {el : False for el in list_files}
+
+    # The files are parsed only ahead of the free connections, so the memory doesn't grow with the number of files
+    slots = asyncio.Semaphore(2 * settings.database_connection.pool_size)
+    async with asyncio.TaskGroup() as tg :
+        tasks = [
+            tg.create_task(async_upload_file(pool=pool, path=el, days=days, slots=slots)) for el in list_files
+        ]
+    await pool.close_pool()
+
+    results = [task.result() for task in tasks]
+    log.logger.info(f'{results.count(True)} of {len(list_files)} sales data files have been successfully '
+                    f'uploaded on {settings.database_connection.pool_size} asynchronous connections.')
+
+    return dict(zip(list_files, results))
+
+
+def get_sales_files() -> list[Path]:
+    '''
+    Finding all of sales data files of each cash register of each store
+    :return: a sorted list of the sales data files
+    '''
+    list_files = []
     path = PurePath.joinpath(dir_name, settings.sales_storing_path)
     log.logger.debug(f'Reading data path: {path}')
     if Path(path).is_dir() :
-        # Compiling "re"-pattern for the name of csv-sales data file
-        regexp = re.compile(r'\d{1,4}_\d{1,4}.csv')
-        # Finding all of csv files
-        list_csv = []
-        for el in Path(path).iterdir() :
+        # Compiling "re"-pattern for the name of sales data file (in the format set by the settings)
+        regexp = re.compile(rf'\d{{1,4}}_\d{{1,4}}\.{settings.sales_format}$')
+        # Finding all of sales data files (including the day subfolders of the backfill mode)
+        for el in sorted(Path(path).rglob(f'*.{settings.sales_format}')) :
             if regexp.match(el.name, 0) :
-                list_csv.append(el)
-        log.logger.debug(f'{len(list_csv)} data files were detected.')
-        if len(list_csv) == 0 :
+                list_files.append(el)
+        log.logger.debug(f'{len(list_files)} data files were detected.')
+        if len(list_files) == 0 :
             log.logger.info(f'No download data files were found.')
 
-        for el in list_csv :
-            # Filling the data frame
-            try :
-                log.logger.debug(f'Reading data file: {el}.')
-                df = pd.concat([df, pd.read_csv(el)])
-            except Exception as e :
-                log.logger.error(f'An error has occurred: {e}')
+    return list_files
 
-            # deleting processed "csv" file
-            Path.unlink(PurePath.joinpath(path, el))
+
+def read_data_file(path: Path) -> pd.DataFrame | None:
+    '''
+    Reading one sales data file
+    :param path: the sales data file
+    :return: the data frame with the sales of the file or None (in case of an error)
+    '''
+    try :
+        log.logger.debug(f'Reading data file: {path}.')
+        return read_sales_file(path)
+    except Exception as e :
+        log.logger.error(f'An error has occurred: {e}')
+        return None
+
+
+async def read_operation_day(list_files: list[Path]) -> pd.DataFrame:
+    '''
+    The function of file processing of generated sales data for each cash register of each store:
+    the files are parsed concurrently on a thread pool and concatenated at once
+    :param list_files: the list of the sales data files
+    :return: a data frame with all sales for further processing (the first level of its index is the data file)
+    '''
+    time_start = perf_counter()
+    size_mb = sum(el.stat().st_size for el in list_files) / 2**20
+    with ThreadPoolExecutor() as executor :
+        frames = dict(zip(list_files, executor.map(read_data_file, list_files)))
+    frames = {el : df for el, df in frames.items() if df is not None}
+    df = concat_sales(list(frames.values()), keys=list(frames))
+    time_read = perf_counter() - time_start
+    log.logger.info(f'{len(frames)} data files ({size_mb:.1f} MB, {len(df)} rows) have been read in '
+                    f'{time_read:.2f} sec. ({size_mb / time_read:.1f} MB per sec.)')
 
     return df
 
 
+async def sales_merge(db: Database, list_files: list[Path], run_id: str) -> dict[Path, bool]:
+    '''
+    Uploading the sales through the staging table: the sales data files are bulk loaded into the staging table
+    as they are, and the receipts and the receipt lines are filled in with set-based queries in one transaction
+    (the store, the cash register and the product IDs are decoded by the database itself).
+    The staged sales with an unknown store/cashier's identification code or product fail the merging as a whole.
+    The files claimed by the run are marked as loaded in the ingestion ledger and the daily sales rollup is refreshed
+    for the staged days in the same transaction.
+    :param db: the instance of the Database class
+    :param list_files: the list of the sales data files
+    :param run_id: the ID of the uploader run (the files are claimed in the ingestion ledger with it)
+    :return: the dict. with the success indicator of each data file
+    '''
+    if not db.run_query(query=STAGING_CREATE_QUERY).is_successful :
+        log.logger.error(f'Database operation error: couldn\'t create the staging table "{STAGING_TABLE}".')
+        return {el : False for el in list_files}
+
+    merge_queries = (
+        (MERGE_RECEIPT_KEY_QUERY, MERGE_RECEIPT_LINE_KEY_QUERY) if settings.receipt_key == 'bigint' else
+        (MERGE_RECEIPT_QUERY, MERGE_RECEIPT_LINE_QUERY)
+    )
+    res = db.stage_rows(
+        staging_table=STAGING_TABLE,
+        frames=(read_sales_file(el) for el in list_files),
+        staging_fields=STAGING_FIELDS,
+        queries=(
+            STAGING_COUNT_QUERY, STAGING_REJECT_QUERY, MERGE_PARTITION_QUERY, *merge_queries, MERGE_ROLLUP_QUERY,
+            STAGING_CLEAR_QUERY, (LEDGER_RUN_DONE_QUERY, (run_id,))
+        )
+    )
+    if not res.is_successful :
+        log.logger.error(f'Database operation error: couldn\'t merge the sales data from the staging table.')
+        return {el : False for el in list_files}
+
+    (staged_receipts, staged_lines), = res.value[0]
+    log_partitions(DBQueryResult(True, res.value[2]))
+    for table_name, staged, inserted in (
+            ('receipt', staged_receipts, res.value[3]), ('receipt_line', staged_lines, res.value[4])
+    ) :
+        log.logger.info(f'The sales data have been successfully merged into the "{table_name}" table '
+                        f'({inserted} rows inserted, {staged - inserted} rows skipped as duplicates).')
+    log_rollup(DBQueryResult(True, res.value[5]))
+
+    return {el : True for el in list_files}
+
+
+def get_file_name(path: Path) -> str:
+    ''' Getting the name of the data file for the ingestion ledger (relative to the sales data folder) '''
+    return path.relative_to(PurePath.joinpath(dir_name, settings.sales_storing_path)).as_posix()
+
+
+def get_file_hash(path: Path) -> str:
+    ''' Getting the hash of the data file contents for the ingestion ledger '''
+    with open(path, 'rb') as f :
+        return hashlib.file_digest(f, 'sha1').hexdigest()
+
+
+def archive_file(path: Path) -> None:
+    '''
+    Moving the processed data file to the archive (keeping its path relative to the sales data folder)
+    :param path: the sales data file
+    '''
+    path_archive = Path(PurePath.joinpath(dir_name, settings.sales_archive_path, get_file_name(path)))
+    path_archive.parent.mkdir(parents=True, exist_ok=True)
+    path.replace(path_archive)
+
+
+def claim_files(db: Database, run_id: str) -> dict[Path, str] | None:
+    '''
+    Claiming the sales data files for uploading in the ingestion ledger. The files which have already been loaded
+    (the same name and the same contents) are not read again - they are just moved to the archive, and the files
+    claimed by another live run of the uploader are skipped.
+    :param db: the instance of the Database class
+    :param run_id: the ID of the uploader run
+    :return: the dict. of the claimed files with their hashes (None - in case of an error)
+    '''
+    list_files = get_sales_files()
+    if len(list_files) == 0 :
+        return {}
+
+    if not db.run_query(query=LEDGER_CREATE_QUERY).is_successful :
+        log.logger.error(f'Database operation error: couldn\'t create the ingestion ledger "{LEDGER_TABLE}".')
+        return None
+
+    res = db.run_query(query=LEDGER_DONE_QUERY)
+    if not res.is_successful :
+        log.logger.error(f'Database operation error: couldn\'t read the ingestion ledger "{LEDGER_TABLE}".')
+        return None
+    done_files = set(res.value)
+
+    new_files = {}
+    for el in list_files :
+        file_hash = get_file_hash(el)
+        if (get_file_name(el), file_hash) in done_files :
+            archive_file(el)
+        else :
+            new_files[el] = file_hash
+    if len(new_files) < len(list_files) :
+        log.logger.info(f'{len(list_files) - len(new_files)} data files have already been uploaded '
+                        f'and were moved to the archive.')
+    if len(new_files) == 0 :
+        return {}
+
+    res = db.run_query(
+        query=LEDGER_CLAIM_QUERY,
+        params=(run_id, [get_file_name(el) for el in new_files], list(new_files.values()),
+                settings.upload.claim_timeout)
+    )
+    if not res.is_successful :
+        log.logger.error(f'Database operation error: couldn\'t claim the data files in the ingestion ledger.')
+        return None
+
+    # The files claimed by the other live runs are left to them
+    claimed_keys = set(res.value)
+    claimed_files = {el : file_hash for el, file_hash in new_files.items()
+                     if (get_file_name(el), file_hash) in claimed_keys}
+    if len(claimed_files) < len(new_files) :
+        log.logger.info(f'{len(new_files) - len(claimed_files)} data files are being uploaded by another run '
+                        f'of the uploader and were skipped.')
+
+    return claimed_files
+
+
+def complete_files(db: Database, run_id: str, claimed_files: dict[Path, str], results: dict[Path, bool],
+                   days: list[tuple[date, date]] | None = None) -> bool:
+    '''
+    Marking the claimed files in the ingestion ledger as loaded ("done") or failed and moving the loaded files
+    to the archive. The failed files stay in place and are claimed again by the next run.
+    The daily sales rollup is refreshed for the uploaded days in the same transaction, so the files aren't marked
+    as loaded if their days haven't been recounted.
+    :param db: the instance of the Database class
+    :param run_id: the ID of the uploader run (only the files claimed with it are marked)
+    :param claimed_files: the dict. of the claimed files with their hashes
+    :param results: the dict. with the success indicator of each data file
+    :param days: the first and the last days of the sales of the uploaded data (none - the rollup is refreshed
+                 by the uploading itself)
+    :return: a boolean value is an indicator of the operation's success.
+    '''
+    statuses = {el : 'done' if results.get(el, False) else 'failed' for el in claimed_files}
+    queries = [(
+        LEDGER_MARK_QUERY,
+        tuple((status, status, get_file_name(el), claimed_files[el], run_id) for el, status in statuses.items()),
+        True
+    )]
+    if days :
+        queries.append((ROLLUP_DAYS_QUERY, (min(d[0] for d in days), max(d[1] for d in days)), False))
+    res = db.run_queries(queries=tuple(queries))
+    if not res.is_successful :
+        # The loaded files stay claimed, and the next run will load them again (the loading is idempotent)
+        log.logger.error(f'Database operation error: couldn\'t mark the data files in the ingestion ledger '
+                         f'and refresh the daily sales rollup "{ROLLUP_TABLE}", they will be claimed again '
+                         f'by the next run.')
+        return False
+    if days :
+        log_rollup(DBQueryResult(True, res.value[1]))
+
+    for el, status in statuses.items() :
+        if status == 'done' :
+            archive_file(el)
+    failed = list(statuses.values()).count('failed')
+    if failed > 0 :
+        log.logger.error(f'{failed} data files haven\'t been uploaded, they will be claimed again by the next run.')
+    return True
+
+
 async def summary_info(db:Database) :
     '''
     Accessing the database for summary information and outputting the report by the logger.
@@ -179,16 +742,47 @@ async def main() :
     if not db.is_connected :
         return False
 
-    df_read_only = await read_operation_day()
-    if len(df_read_only) == 0 :
+    # Claiming the new data files in the ingestion ledger
+    run_id = uuid4().hex
+    claimed_files = claim_files(db=db, run_id=run_id)
+    if not claimed_files :
         return False
+    list_files = list(claimed_files)
 
-    # Creating two tasks for asynchronous launch of two coroutines
-    async with asyncio.TaskGroup() as tg :
-        task1 = tg.create_task(receipts_upload(db=db, df=df_read_only))
-        task2 = tg.create_task(receipt_lines_upload(db=db, df=df_read_only))
+    # The daily sales rollup read by the summary (it's filled in from the main tables if it has just been created)
+    if not db.run_query(query=ROLLUP_CREATE_QUERY).is_successful :
+        log.logger.error(f'Database operation error: couldn\'t create the daily sales rollup "{ROLLUP_TABLE}".')
+        return False
+    if not log_rollup(db.run_query(query=ROLLUP_BACKFILL_QUERY)) :
+        return False
 
-    if task1.result() and task2.result() :
+    # The days of the uploaded sales (the daily sales rollup is refreshed for them with marking the files as loaded)
+    days = []
+    if settings.upload.method == 'merge' :
+        # All the decoding and the joining is done by the database (in one transaction on one connection)
+        results = await sales_merge(db=db, list_files=list_files, run_id=run_id)
+    elif not load_lookups(db=db) :
+        results = {}
+    elif settings.upload.method == 'insert' and not db.run_query(query=PROGRESS_CREATE_QUERY).is_successful :
+        log.logger.error(f'Database operation error: couldn\'t create the upload progress table.')
+        results = {}
+    elif settings.upload.backend == 'async' :
+        results = await async_upload(list_files=list_files, days=days)
+    else :
+        df_read_only = await read_operation_day(list_files=list_files)
+        pool: DatabasePool = DatabasePool(settings.database_connection)
+        results = {}
+        if (len(df_read_only) > 0 and pool.is_connected
+                and log_partitions(db.run_query(PARTITION_CREATE_QUERY, get_partition_days(df_read_only)))) :
+            results = await concurrent_upload(pool=pool, df=df_read_only)
+            days.append(get_partition_days(df_read_only))
+        pool.close_pool()
+
+    # Marking the files as loaded only after the commit of their data (and archiving them)
+    is_completed = complete_files(db=db, run_id=run_id, claimed_files=claimed_files, results=results, days=days)
+    is_successful = is_completed and len(results) == len(list_files) and all(results.values())
+
+    if is_successful :
         log.logger.info(f'The uploader of the day`s sales was completed, '
                         f'execution time - {(datetime.now() - time_start).total_seconds():.2f} seconds.')
         # Outputting summary info
@@ -198,6 +792,9 @@ async def main() :
 
 
 if __name__ == '__main__':
+    # The asynchronous driver (psycopg 3) can't work on the default proactor event loop of Windows
+    if sys.platform == 'win32' :
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
     asyncio.run(main())
 
     # asyncio.run(summary_info())
\ No newline at end of file
@@ -1,12 +1,66 @@
 # A module with auxiliary utilities for generating sales.
 
+import numpy as np
 import pandas as pd
+from pandas.api.types import union_categoricals
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path, PurePath
+from string import ascii_uppercase, ascii_lowercase
 
 import logger as log
 from config_py import settings, dir_name
 
 
+# The fixed schema of the sales files: the repeated names of goods and categories are stored as dictionaries
+SALES_DTYPES = dict(item='category', category='category', amount='int16', receipt_time='datetime64[s]')
+
+# The receipt ID is the code of the cash register followed by the time of the receipt "YYYYMMDDHHMMSS"
+RECEIPT_STAMP_LEN = 14
+
+# The packed bigint receipt key: the store (17 bits), the cash register (12 bits)
+# and the seconds since the epoch (34 bits) of the receipt
+RECEIPT_KEY_STORE_SHIFT = 46
+RECEIPT_KEY_CASH_REG_SHIFT = 34
+RECEIPT_KEY_EPOCH = '2000-01-01 00:00:00'
+
+
+def _get_letters(number: int, alphabet: str) -> str:
+    ''' The bijective base-26 notation of the positive number (1 - "A", 26 - "Z", 27 - "AA", ...) '''
+    letters = ''
+    while number > 0 :
+        number, rest = divmod(number - 1, len(alphabet))
+        letters = alphabet[rest] + letters
+    return letters
+
+
+def get_cash_reg_code(id_store: int, id_cash_reg: int) -> str:
+    '''
+    Getting the code of the cash register - the prefix of its receipt IDs: the store in upper case letters
+    and the cash register in lower case letters ("Aa", "Ab", ..., "Zz", "AAa", ...), so the number of stores
+    and cash registers isn't limited by the alphabet
+    :param id_store: store ID
+    :param id_cash_reg: cash register ID
+    :return: the code of the cash register
+    '''
+    return _get_letters(id_store, ascii_uppercase) + _get_letters(id_cash_reg, ascii_lowercase)
+
+
+def pack_receipt_keys(id_stores, id_cash_regs, receipt_times) -> np.ndarray:
+    '''
+    Vectorized packing of the store, the cash register and the time of the receipts into the bigint receipt keys
+    :param id_stores: store IDs
+    :param id_cash_regs: cash register IDs
+    :param receipt_times: the time of the receipts (up to a second)
+    :return: the array of the receipt keys (int64)
+    '''
+    seconds = (np.asarray(receipt_times, dtype='datetime64[s]') - np.datetime64(RECEIPT_KEY_EPOCH, 's')).astype(np.int64)
+    return (
+        (np.asarray(id_stores).astype(np.int64) << RECEIPT_KEY_STORE_SHIFT) |
+        (np.asarray(id_cash_regs).astype(np.int64) << RECEIPT_KEY_CASH_REG_SHIFT) |
+        seconds
+    )
+
+
 def _check_path(path_save: str) -> None:
     '''
     A simple function to check and create a folder using the specified path.
@@ -15,8 +69,8 @@ def _check_path(path_save: str) -> None:
     '''
     path = PurePath.joinpath(dir_name, path_save)
     if not Path(path).is_dir() :
-        # Creating a folder if it doesn't exist yet
-        Path.mkdir(path)
+        # Creating a folder (with its parents) if it doesn't exist yet
+        Path(path).mkdir(parents=True)
 
 
 def _save_to_csv(df: pd.DataFrame, path_save: str, name: str) -> bool :
@@ -37,6 +91,71 @@ def _save_to_csv(df: pd.DataFrame, path_save: str, name: str) -> bool :
     return True
 
 
+def _save_to_columnar(df: pd.DataFrame, path_save: str, name: str) -> bool :
+    '''
+    Auxiliary function for saving a dataframe to a typed, dictionary-encoded and compressed columnar file
+    ("parquet" or "arrow" format - by the extension of the file name)
+    :param df: the data frame for saving
+    :param path_save: the path to save
+    :param name: the name of the file where the date frame will be saved (only name)
+    :return: a boolean value is an indicator of the operation's success.
+    '''
+    path = PurePath.joinpath(dir_name, path_save, name)
+    try:
+        df = df.astype(SALES_DTYPES)
+        if name.endswith('.parquet') :
+            df.to_parquet(path, index=False, compression='zstd')
+        else :
+            df.to_feather(path, compression='zstd')
+    except Exception as e:
+        log.logger.error(f'An error has occurred: {e}')
+        return False
+
+    return True
+
+
+def read_sales_file(path: PurePath) -> pd.DataFrame :
+    '''
+    Reading the sales file of a cash register in any supported format (by the extension of the file)
+    :param path: the path of the file
+    :return: the data frame with sales (in the fixed schema SALES_DTYPES)
+    '''
+    if path.suffix == '.parquet' :
+        return pd.read_parquet(path)
+    if path.suffix == '.arrow' :
+        # The arrow file is memory-mapped, so the reading is close to zero-copy
+        from pyarrow import feather
+        return feather.read_table(path, memory_map=True).to_pandas()
+    # The csv file is parsed straight into the fixed schema (the goods and the categories - into dictionaries),
+    # so no column of the repeated strings is built for it
+    import pyarrow as pa
+    from pyarrow import csv
+    column_types = {
+        name : pa.dictionary(pa.int32(), pa.string()) if dtype == 'category' else pa.from_numpy_dtype(np.dtype(dtype))
+        for name, dtype in SALES_DTYPES.items()
+    }
+    return csv.read_csv(path, convert_options=csv.ConvertOptions(column_types=column_types)).to_pandas()
+
+
+def concat_sales(frames: list[pd.DataFrame], keys: list | None = None) -> pd.DataFrame :
+    '''
+    Concatenating the sales data frames of the cash registers at once
+    :param frames: the list of the sales data frames (read by the "read_sales_file" function)
+    :param keys: the keys of the frames - the first level of the index of the result (the index is reset if not set)
+    :return: the concatenated data frame (in the fixed schema SALES_DTYPES)
+    '''
+    if len(frames) == 0 :
+        return pd.DataFrame()
+    # The dictionaries of the files are united first: the categorical columns with different dictionaries
+    # would be concatenated into the columns of the strings
+    categories = {
+        name : union_categoricals([df[name] for df in frames]).categories
+        for name, dtype in SALES_DTYPES.items() if dtype == 'category'
+    }
+    frames = [df.astype({name : pd.CategoricalDtype(c) for name, c in categories.items()}) for df in frames]
+    return pd.concat(frames, keys=keys, ignore_index=keys is None)
+
+
 def post_process_df(df: pd.DataFrame) -> pd.DataFrame:
     '''
     Auxiliary function for additional processing of the final data frame
@@ -61,35 +180,60 @@ def post_process_df(df: pd.DataFrame) -> pd.DataFrame:
     return df_res
 
 
-def save_by_units(df: pd.DataFrame, path_save: str) -> None:
+def save_unit(df: pd.DataFrame, path_save: str, id_store: int, id_cash_reg: int) -> bool :
+    '''
+    The function of saving the sales file of one cash register: <storage number>_<cache registry number>.<format>
+    (the format of the file is set by the "sales_format" settings field)
+    :param df: the data frame with sales of the cash register (without the store and cash register fields)
+    :param path_save: the path to save
+    :param id_store: store ID
+    :param id_cash_reg: cash register ID
+    :return: a boolean value is an indicator of the operation's success.
+    '''
+    name = f'{id_store}_{id_cash_reg}.{settings.sales_format}'
+    save_func = _save_to_csv if settings.sales_format == 'csv' else _save_to_columnar
+    if save_func(df=df, path_save=path_save, name=name) :
+        log.logger.debug(
+            f'The sales history of cash register No. {id_cash_reg} from store No. {id_store} has been successfully '
+            f'saved in the file "{name}".'
+        )
+        return True
+
+    log.logger.info(
+        f'The sales history of cash register No. {id_cash_reg} from store No. {id_store} has not been saved!'
+    )
+    return False
+
+
+def save_by_units(df: pd.DataFrame, path_save: str, max_workers: int | None = None) -> None:
     '''
     The function of saving sales files for stores and cash registers.
-    Each file name will look like this: <storage number>_<cache registry number>.csv
+    Each file name will look like this: <storage number>_<cache registry number>.<format>
+    The data frame is partitioned in one pass, the partitions are written concurrently by the thread pool.
     :param df: the data frame for saving
     :param path_save: the path to save
+    :param max_workers: the maximum number of the writing threads (None - the thread pool default)
     :return: None
     '''
-
-    stores = df['id_store'].unique()
-    cash_regs = df['id_cash_reg'].unique()
-
-    # Setting a multi-index
-    df = df.set_index(keys=['id_store', 'id_cash_reg'])
-
-    # Using a multi-index, we quickly filter records for each file.
-    for s in stores :
-        for cr in cash_regs :
-            try :
-                df_chunk = df.loc[s, cr][:]
-                if _save_to_csv(df=df_chunk, path_save=path_save, name=f'{s}_{cr}.csv') :
-                    log.logger.info(
-                        f'The sales history of cash register No. {cr} from store No. {s} has been successfully '
-                        f'saved in the file "{s}_{cr}.csv".'
-                    )
-                else :
-                    log.logger.info(
-                        f'The sales history of cash register No. {cr} from store No. {s} has not been saved!'
-                    )
-
-            except KeyError as e :
-                break
+    with ThreadPoolExecutor(max_workers=max_workers) as pool :
+        futures = {
+            (s, cr, len(df_chunk)): pool.submit(
+                save_unit,
+                df=df_chunk.drop(columns=['id_store', 'id_cash_reg']),
+                path_save=path_save,
+                id_store=s,
+                id_cash_reg=cr
+            )
+            for (s, cr), df_chunk in df.groupby(['id_store', 'id_cash_reg'], sort=True)
+        }
+
+    # The summary of the saved files
+    total_rows, total_bytes = 0, 0
+    for (s, cr, rows), future in futures.items() :
+        if future.result() :
+            name = f'{s}_{cr}.{settings.sales_format}'
+            size = Path(PurePath.joinpath(dir_name, path_save, name)).stat().st_size
+            total_rows += rows
+            total_bytes += size
+            log.logger.info(f'The file "{name}": {rows} rows / {size} bytes.')
+    log.logger.info(f'{len(futures)} sales files have been saved: {total_rows} rows / {total_bytes} bytes.')
@@ -1,12 +1,27 @@
-# A class for working with a database.
+# Classes for working with a database.
+#
+#   Class name: DatabasePool
+#   Methods:
+#       database() - a context manager giving the Database instance on a pooled connection
+#       close_pool()
+#
+#   Class name: DimensionCache
+#   Methods:
+#       get_version(table_name)
+#       read(table_name, columns) - reading the dimension table through the local cache
 #
 #   Class name: Database
 #   Methods:
 #       run_query(table_name, params, several) - main method
+#       run_queries(queries)
+#       run_batches(query, params, batch_size, start, key_len, progress_query, progress_params)
 #       read_rows(table_name, columns_statement, condition_statement, order_by_statement, limit)
 #       search_table(table_name)
-#       create_table(table_name, columns_statement, overwrite)
+#       create_table(table_name, columns_statement, overwrite, partition_statement)
 #       insert_rows(table_name, values, insert_fields, returning_field)
+#       run_values(query, values, fetch)
+#       copy_rows(table_name, df, insert_fields, on_conflict_statement, copy_format)
+#       stage_rows(staging_table, frames, staging_fields, queries)
 #       update_data(table_name, set_statement, condition_statement)
 #       delete_rows(table_name, condition_statement)
 #       count_rows(table_name)
@@ -14,9 +29,17 @@
 
 
 import psycopg2
-from psycopg2 import extensions
+from psycopg2 import extensions, extras
+from psycopg2.pool import ThreadedConnectionPool
+from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import NamedTuple
+from io import BytesIO, StringIO
+from itertools import islice
+import os
+from pathlib import Path, PurePath
+import numpy as np
+import pandas as pd
+from typing import Iterable, Iterator, NamedTuple
 
 import logger as log
 from config_py import DBConnectionSettings
@@ -26,11 +49,168 @@ Row = NamedTuple
 Rows = tuple[Row, ...]
 ConnectionType = psycopg2.extensions.connection
 
+# The progress of the batched writing
+@dataclass(slots=True, frozen=True)
+class BatchProgress :
+    rows: int              # the number of the committed rows of the parameters
+    affected: int          # the number of the rows affected by the committed batches
+    last_key: str          # the key of the last committed row
+
 # The data structure returned by most methods
 @dataclass(slots=True, frozen=True)
 class DBQueryResult :
     is_successful: bool    # this is the success flag
-    value: tuple | int | None    # received data
+    value: tuple | int | BatchProgress | None    # received data
+
+
+def get_row_key(row: Row, key_len: int = 1) -> str :
+    ''' Getting the key of the row (its first "key_len" fields) for the batch progress '''
+    return '|'.join(str(v) for v in row[:key_len])
+
+
+def iter_frame_rows(df: pd.DataFrame, chunk_size: int = 10000) -> Iterator[tuple] :
+    '''
+    Feeding the rows of the data frame to the driver without materializing all of them: the rows are built
+    chunk by chunk from the column arrays (the missing values are turned into None)
+    :param df: the data frame (the columns follow the order of the query parameters)
+    :param chunk_size: the number of rows converted into Python objects at once
+    :return: the iterator of the row tuples
+    '''
+    for chunk_start in range(0, len(df), chunk_size) :
+        chunk = df.iloc[chunk_start : chunk_start + chunk_size]
+        yield from zip(*(chunk[col].to_numpy(dtype=object, na_value=None).tolist() for col in chunk.columns))
+
+
+# The binary COPY format: the signature, the flags and the header extension length, the trailer
+COPY_BINARY_HEADER = b'PGCOPY\n\xff\r\n\x00' + bytes(8)
+COPY_BINARY_TRAILER = b'\xff\xff'
+# The timestamps are sent as microseconds since the PostgreSQL epoch
+PG_EPOCH = np.datetime64('2000-01-01T00:00:00', 'us')
+
+
+def get_binary_column(col: pd.Series) -> tuple[str, np.ndarray, np.ndarray] :
+    '''
+    Encoding the column of the data frame into the PostgreSQL binary format straight from its array
+    :param col: the column of the data frame
+    :return: the PostgreSQL type of the column, the lengths of the values (-1 - NULL)
+             and the bytes of the not NULL values in the order of the rows
+    '''
+    is_null = col.isna().to_numpy()
+    dtype = col.dtype
+    if isinstance(dtype, pd.CategoricalDtype) :
+        # The categories are encoded once, the values are taken by their codes
+        pg_type, cat_lens, cat_data = get_binary_column(pd.Series(dtype.categories.astype(str)))
+        codes = col.cat.codes.to_numpy()
+        cat_offsets = np.concatenate(([0], np.cumsum(cat_lens)))
+        lens = np.where(is_null, -1, cat_lens[codes])
+        starts = cat_offsets[codes[~is_null]]
+        sizes = lens[~is_null]
+        data = cat_data[np.repeat(starts - np.cumsum(sizes) + sizes, sizes) + np.arange(sizes.sum())]
+        return pg_type, lens.astype('int32'), data
+
+    if pd.api.types.is_bool_dtype(dtype) :
+        pg_type, values = 'bool', col.to_numpy(dtype='u1', na_value=0)
+    elif pd.api.types.is_integer_dtype(dtype) :
+        width = max(dtype.itemsize, 2)
+        pg_type = {2 : 'int2', 4 : 'int4'}.get(width, 'int8')
+        values = col.to_numpy(dtype=f'>i{min(width, 8)}', na_value=0)
+    elif pd.api.types.is_float_dtype(dtype) :
+        pg_type = 'float4' if dtype.itemsize == 4 else 'float8'
+        values = col.to_numpy(dtype=f'>f{dtype.itemsize}', na_value=0)
+    elif pd.api.types.is_datetime64_dtype(dtype) :
+        pg_type = 'timestamp'
+        values = ((col.to_numpy(dtype='datetime64[us]') - PG_EPOCH).view('int64')).astype('>i8')
+    elif pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype) :
+        # The arrow string array already keeps the UTF-8 bytes of the values one after another with their offsets
+        import pyarrow as pa
+        values = pa.array(col.to_numpy(dtype=object, na_value=None), type=pa.large_string())
+        _, offsets_buffer, data_buffer = values.buffers()
+        offsets = np.frombuffer(offsets_buffer, dtype='int64', count=len(col) + 1)
+        lens = np.where(is_null, -1, np.diff(offsets)).astype('int32')
+        data = np.frombuffer(data_buffer, dtype='u1', count=int(offsets[-1])) if offsets[-1] > 0 else np.empty(0, 'u1')
+        return 'text', lens, data
+    else :
+        raise TypeError(f'the column "{col.name}" of the type "{dtype}" can\'t be encoded for the binary COPY')
+
+    width = values.dtype.itemsize
+    lens = np.where(is_null, -1, width).astype('int32')
+    return pg_type, lens, values.view('u1').reshape(len(col), width)[~is_null].ravel()
+
+
+def get_binary_rows(df: pd.DataFrame) -> tuple[np.ndarray, tuple[str, ...]] :
+    '''
+    Encoding the rows of the data frame in the binary COPY format by scattering the bytes of the columns
+    into one array, so no Python object is built for any value
+    :param df: the data frame
+    :return: the encoded rows and the PostgreSQL types of the columns
+    '''
+    n_rows = len(df)
+    columns = [get_binary_column(df[col]) for col in df.columns]
+    field_sizes = [np.maximum(lens, 0).astype('int64') for _, lens, _ in columns]
+
+    # The row: the number of the fields, then the length and the bytes of each field
+    row_sizes = 2 + 4 * len(columns) + sum(field_sizes, np.zeros(n_rows, dtype='int64'))
+    row_offsets = np.concatenate(([0], np.cumsum(row_sizes)[:-1])).astype('int64')
+    buffer = np.empty(int(row_sizes.sum()), dtype='u1')
+
+    fields_count = np.full(n_rows, len(columns), dtype='>i2').view('u1').reshape(n_rows, 2)
+    buffer[row_offsets[:, None] + np.arange(2)] = fields_count
+    position = row_offsets + 2
+    for (_, lens, data), sizes in zip(columns, field_sizes) :
+        buffer[position[:, None] + np.arange(4)] = lens.astype('>i4').view('u1').reshape(n_rows, 4)
+        position = position + 4
+        buffer[np.repeat(position - (np.cumsum(sizes) - sizes), sizes) + np.arange(len(data))] = data
+        position = position + sizes
+
+    return buffer, tuple(pg_type for pg_type, _, _ in columns)
+
+
+def get_binary_copy(df: pd.DataFrame, chunk_size: int = 100000) -> tuple[BytesIO, tuple[str, ...]] :
+    '''
+    Encoding the data frame for the "COPY ... FROM STDIN WITH (FORMAT binary)" command
+    :param df: the data frame
+    :param chunk_size: the number of rows encoded at once (it limits the memory of the scattering)
+    :return: the buffer with the encoded data and the PostgreSQL types of the columns
+    '''
+    buffer = BytesIO()
+    buffer.write(COPY_BINARY_HEADER)
+    pg_types = ()
+    for chunk_start in range(0, len(df), chunk_size) :
+        rows, pg_types = get_binary_rows(df.iloc[chunk_start : chunk_start + chunk_size])
+        buffer.write(rows.data)
+    buffer.write(COPY_BINARY_TRAILER)
+    buffer.seek(0)
+    return buffer, pg_types
+
+
+def get_copy_statements(
+        tmp_table: str,
+        table_name: str,
+        df: pd.DataFrame,
+        insert_fields: tuple[str] | None,
+        copy_format: str
+) -> tuple[str, str, StringIO | BytesIO] :
+    '''
+    Preparing the bulk loading of the data frame into the temporary table
+    :return: the query creating the temporary table, the COPY command and the buffer with the data
+    '''
+    fields = tuple(df.columns) if insert_fields is None else insert_fields
+    if copy_format == 'binary' :
+        # The temporary table gets the types of the encoded columns (they are cast by the insertion)
+        buffer, pg_types = get_binary_copy(df)
+        columns_str = ', '.join(f'{field} {pg_type}' for field, pg_type in zip(fields, pg_types))
+        return (f'CREATE TEMP TABLE {tmp_table} ({columns_str}) ON COMMIT DROP',
+                f'COPY {tmp_table} FROM STDIN WITH (FORMAT binary)',
+                buffer)
+
+    # Building the in-memory buffer straight from the data frame
+    buffer = StringIO()
+    df.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    fields_str = '' if insert_fields is None else f'({", ".join(insert_fields)})'
+    return (f'CREATE TEMP TABLE {tmp_table} (LIKE {table_name}) ON COMMIT DROP',
+            f'COPY {tmp_table} {fields_str} FROM STDIN WITH (FORMAT csv)',
+            buffer)
 
 
 class Database :
@@ -42,12 +222,21 @@ class Database :
     #         cls.__db_instance = super().__new__(cls)
     #     return cls.__db_instance
 
-    def __init__(self, db_connect_set: DBConnectionSettings)  -> object:
-        ''' Constructor '''
+    def __init__(self, db_connect_set: DBConnectionSettings, connect: ConnectionType | None = None)  -> object:
+        '''
+        Constructor
+        :param db_connect_set: the database connection settings
+        :param connect: the already opened connection (taken from the pool) - it isn't closed by this instance
+        '''
         self.db_connect_set = db_connect_set
+        self._is_pooled = connect is not None
+        if self._is_pooled :
+            self.connect: ConnectionType = connect
+            self.is_connected = True
+            return
         try :
             self.connect: ConnectionType = psycopg2.connect(
-                **db_connect_set.model_dump()
+                **db_connect_set.model_dump(exclude={'pool_size'})
             )
             log.logger.debug('The database has been successfully connected.')
             self.is_connected = True
@@ -82,6 +271,72 @@ class Database :
             return DBQueryResult(False, None)
 
 
+    def run_queries(self, queries: tuple[tuple[str, tuple, bool], ...]) -> DBQueryResult :
+        '''
+        Running several queries in one transaction
+        :param queries: the queries with their parameters and the flag of several rows of the parameters
+                        (see the "run_query" method)
+        :return: the tuple of the query results (the received data or the number of affected rows)
+        '''
+        try :
+            with self.connect:
+                with self.connect.cursor() as cursor :
+                    results = []
+                    for query, params, several in queries :
+                        if several :
+                            cursor.executemany(query, params)
+                        else :
+                            cursor.execute(query, params)
+                        results.append(cursor.fetchall() if cursor.description else cursor.rowcount)
+                    return DBQueryResult(True, tuple(results))
+
+        except Exception as e :
+            log.logger.error(f"An error occurred while executing the requests: {e}")
+            return DBQueryResult(False, None)
+
+
+    def run_batches(
+            self,
+            query: str,
+            params: Iterable[tuple],
+            batch_size: int,
+            start: int = 0,
+            key_len: int = 1,
+            progress_query: str | None = None,
+            progress_params: tuple = ()
+    ) -> DBQueryResult :
+        '''
+        Running the query for many rows of the parameters in batches - each batch is committed separately
+        (instead of one huge transaction). The progress query (if set) is run in the transaction of each batch
+        with the number of the committed rows and the key of the last committed row appended to its parameters,
+        so the saved progress always matches the committed data.
+        :param start: the number of the rows committed earlier (the writing is resumed from this row)
+        :param key_len: the number of the first fields of the row that make its key
+        :return: the progress of the writing (in case of an error - the progress of the committed batches)
+        '''
+        # The rows committed earlier are skipped (the parameters may be a lazy iterator)
+        params_iter = iter(params)
+        rows, affected, last_key = 0, 0, ''
+        for row in islice(params_iter, start) :
+            rows, last_key = rows + 1, get_row_key(row, key_len)
+        try :
+            while batch := tuple(islice(params_iter, batch_size)) :
+                batch_key = get_row_key(batch[-1], key_len)
+                with self.connect:
+                    with self.connect.cursor() as cursor :
+                        cursor.executemany(query, batch)
+                        batch_affected = cursor.rowcount
+                        if progress_query :
+                            cursor.execute(progress_query, progress_params + (rows + len(batch), batch_key))
+                rows, affected, last_key = rows + len(batch), affected + batch_affected, batch_key
+
+        except Exception as e :
+            log.logger.error(f"An error occurred while executing the batch from the row {rows}: {e}")
+            return DBQueryResult(False, BatchProgress(rows, affected, last_key))
+
+        return DBQueryResult(True, BatchProgress(rows, affected, last_key))
+
+
     def search_rows(self, table_name: str, search_column: str = 'id', search_value = 0) -> bool :
         ''' A simple searcher for one column '''
         if table_name :
@@ -126,8 +381,9 @@ class Database :
     def create_table(self,
                      table_name: str,
                      columns_statement: str,
-                     overwrite: bool = False) -> DBQueryResult :
-        ''' Creating a new table '''
+                     overwrite: bool = False,
+                     partition_statement: str = '') -> DBQueryResult :
+        ''' Creating a new table (partitioned one - with the partition statement, e.g. "RANGE (receipt_time)") '''
         if table_name and columns_statement :
             if self.search_table(table_name) :
                 if overwrite :
@@ -140,6 +396,8 @@ class Database :
                     log.logger.debug(f'Error, table "{table_name}" is already there.')
                     return DBQueryResult(False, None)
             query = f'CREATE TABLE {table_name} ({columns_statement})'
+            if partition_statement :
+                query += f' PARTITION BY {partition_statement}'
             return self.run_query(query)
         else :
             return DBQueryResult(False, None)
@@ -152,26 +410,132 @@ class Database :
             insert_fields: tuple[str] | None=None,
             returning_field: str | None=None
     ) -> DBQueryResult:
-        ''' Inserting one or multiple rows into a table. '''
+        '''
+        Inserting one or multiple rows into a table. Multiple rows are inserted by one multi-row statement,
+        so the returning field is received for all of them (in the order of the rows).
+        '''
         if table_name and len(values) > 0 and len(values[0]) > 0 :
             fields_str = ''
             if insert_fields is not None:
                 fields_str += f'({', '.join(insert_fields)})'
+            if len(values)>1:
+                query = f"INSERT INTO {table_name} {fields_str} VALUES %s"
+                if returning_field is not None:
+                    query += f" RETURNING {returning_field}"
+                return self.run_values(query, values=values, fetch=returning_field is not None)
+
+            # if insert single row
             placeholders = ', '.join(['%s'] * len(values[0]))
             query = f"INSERT INTO {table_name} {fields_str} VALUES ({placeholders})"
             if returning_field is not None:
                 query += f" RETURNING {returning_field}"
-            if len(values)>1:
-                several = True
-            else:
-                # if insert single row
-                several = False
-                values = values[0]
+            return self.run_query(query, params=values[0])
+        return DBQueryResult(False, 0)
+
 
-            return self.run_query(query, params=values, several=several)
+    def run_values(self, query: str, values: Rows, fetch: bool = False) -> DBQueryResult :
+        '''
+        Running the query with the multi-row "VALUES %s" statement for all the rows at once (one round trip)
+        :param query: the query with the single "%s" placeholder of the rows
+        :param values: the rows of the values
+        :param fetch: the flag of receiving the data returned by the query
+        :return: the received data (in the order of the rows) or the number of affected rows
+        '''
+        try :
+            with self.connect:
+                with self.connect.cursor() as cursor :
+                    rows = extras.execute_values(cursor, query, values, page_size=len(values), fetch=fetch)
+                    if fetch :
+                        return DBQueryResult(True, rows)
+                    return DBQueryResult(True, cursor.rowcount)
+
+        except Exception as e :
+            log.logger.error(f"An error occurred while executing the request: {e}")
+            return DBQueryResult(False, None)
+
+
+    def copy_rows(
+            self,
+            table_name: str,
+            df: pd.DataFrame,
+            insert_fields: tuple[str] | None=None,
+            on_conflict_statement: str | None='DO NOTHING',
+            copy_format: str = 'csv'
+    ) -> DBQueryResult:
+        '''
+        Bulk loading of the data frame rows into a table with the "COPY ... FROM STDIN" command.
+        The rows are copied into a temporary table first and then inserted into the target table
+        in the same transaction, so the "ON CONFLICT" clause keeps working.
+        The columns of the data frame must follow the order of the insert fields (or of the table columns).
+        :param copy_format: 'csv' - the text of the data frame, 'binary' - the binary format encoded straight
+                            from the column arrays (see the "get_binary_copy" function)
+        :return: the number of inserted rows
+        '''
+        if table_name and len(df) > 0 :
+            fields_str = ''
+            select_str = '*'
+            if insert_fields is not None:
+                select_str = ', '.join(insert_fields)
+                fields_str = f'({select_str})'
+            tmp_table = f'tmp_{table_name}'
+            create_query, copy_query, buffer = get_copy_statements(tmp_table, table_name, df, insert_fields, copy_format)
+
+            query = f'INSERT INTO {table_name} {fields_str} SELECT {select_str} FROM {tmp_table}'
+            if on_conflict_statement :
+                query += f' ON CONFLICT {on_conflict_statement}'
+            try :
+                with self.connect:
+                    with self.connect.cursor() as cursor :
+                        cursor.execute(create_query)
+                        cursor.copy_expert(copy_query, buffer)
+                        cursor.execute(query)
+                        return DBQueryResult(True, cursor.rowcount)
+
+            except Exception as e :
+                log.logger.error(f"An error occurred while copying the rows: {e}")
+                return DBQueryResult(False, None)
         return DBQueryResult(False, 0)
 
 
+    def stage_rows(
+            self,
+            staging_table: str,
+            frames: Iterable[pd.DataFrame],
+            staging_fields: tuple[str, ...],
+            queries: tuple[str | tuple[str, tuple], ...]
+    ) -> DBQueryResult:
+        '''
+        Bulk loading of the data frames into the staging table with the "COPY ... FROM STDIN" command
+        and running the set-based queries over it - all in one transaction.
+        The data frames are loaded one by one, so only one of them is kept in memory at a time.
+        :param queries: the queries (a query with the parameters - the tuple of the query and its parameters)
+        :return: the tuple of the query results (the received data or the number of affected rows)
+        '''
+        if not staging_table or not queries :
+            return DBQueryResult(False, None)
+
+        copy_query = f'COPY {staging_table} ({", ".join(staging_fields)}) FROM STDIN WITH (FORMAT csv)'
+        try :
+            with self.connect:
+                with self.connect.cursor() as cursor :
+                    for df in frames :
+                        buffer = StringIO()
+                        df.loc[:, list(staging_fields)].to_csv(buffer, index=False, header=False)
+                        buffer.seek(0)
+                        cursor.copy_expert(copy_query, buffer)
+
+                    results = []
+                    for query in queries :
+                        query, params = query if isinstance(query, tuple) else (query, None)
+                        cursor.execute(query, params)
+                        results.append(cursor.fetchall() if cursor.description else cursor.rowcount)
+                    return DBQueryResult(True, tuple(results))
+
+        except Exception as e :
+            log.logger.error(f"An error occurred while merging the staged rows: {e}")
+            return DBQueryResult(False, None)
+
+
     def update_data(self,
                     table_name: str,
                     set_statement: str,
@@ -206,9 +570,122 @@ class Database :
 
 
     def close_connection(self) :
-        ''' Closing the database connection '''
+        ''' Closing the database connection (the pooled connection is returned by the pool itself) '''
+        if self._is_pooled :
+            return
         try :
             self.connect.close()
             log.logger.debug('The connection to the database is closed.')
         except Exception as e :
             log.logger.debug(f'An error occurred when closing the connection: {e}')
+
+
+class DatabasePool :
+    # a class for the concurrent work with the database: each thread takes its own connection from the pool
+
+    def __init__(self, db_connect_set: DBConnectionSettings) -> object:
+        ''' Constructor '''
+        self.db_connect_set = db_connect_set
+        try :
+            self.pool = ThreadedConnectionPool(
+                minconn=1,
+                maxconn=db_connect_set.pool_size,
+                **db_connect_set.model_dump(exclude={'pool_size'})
+            )
+            log.logger.debug(f'The database connection pool (up to {db_connect_set.pool_size} connections) '
+                             f'has been successfully created.')
+            self.is_connected = True
+
+        except Exception as e :
+            log.logger.error(f'An error occurred while connecting database: {e}')
+            self.is_connected = False
+
+    def __del__(self) :
+        self.close_pool()
+
+
+    @contextmanager
+    def database(self) -> Iterator[Database] :
+        ''' Getting the Database instance on the connection taken from the pool (it is returned to the pool on exit) '''
+        connect = self.pool.getconn()
+        try :
+            yield Database(self.db_connect_set, connect=connect)
+        finally :
+            self.pool.putconn(connect)
+
+
+    def close_pool(self) :
+        ''' Closing all the connections of the pool '''
+        try :
+            if self.pool.closed :
+                return
+            self.pool.closeall()
+            log.logger.debug('The connection pool to the database is closed.')
+        except Exception as e :
+            log.logger.debug(f'An error occurred when closing the connection pool: {e}')
+
+
+class DimensionCache :
+    # a class for caching the dimension tables (directories) of the database locally
+
+    def __init__(self, db: Database, path: PurePath | None = None) -> object:
+        '''
+        Constructor
+        :param db: the instance of the Database class
+        :param path: the folder of the local copies of the dimension tables (None - the tables are always read)
+        '''
+        self.db = db
+        self.path = path
+
+
+    def get_version(self, table_name: str) -> tuple[int, int] | None :
+        ''' Getting the cheap version stamp of the table: the number of rows and the maximum ID '''
+        res = self.db.run_query(f'SELECT count(*), coalesce(max(id), 0) FROM {table_name}')
+        if not res.is_successful :
+            return None
+        return res.value[0]
+
+
+    def read(self, table_name: str, columns: tuple[str, ...]) -> pd.DataFrame | None :
+        '''
+        Reading the dimension table through the local cache: the local copy of the table is used
+        while its version stamp (the number of rows and the maximum ID) matches the table in the database
+        :param table_name: the name of the dimension table (with the "id" column)
+        :param columns: the columns being read
+        :return: the data frame with the dimension table (None - in case of an error)
+        '''
+        version = self.get_version(table_name)
+        if version is None :
+            return None
+
+        path_file = None
+        if self.path is not None :
+            path_file = Path(self.path, f'{table_name}_{version[0]}_{version[1]}.parquet')
+            if path_file.is_file() :
+                try :
+                    df = pd.read_parquet(path_file)
+                    if tuple(df.columns) == tuple(columns) :
+                        log.logger.debug(f'The dimension table "{table_name}" has been read from the cache.')
+                        return df
+                except Exception as e :
+                    log.logger.warning(f'The cached dimension table "{path_file}" has not been read: {e}')
+
+        res = self.db.read_rows(table_name=table_name, columns_statement=', '.join(columns))
+        if not res.is_successful :
+            return None
+        df = pd.DataFrame(list(res.value), columns=list(columns))
+        log.logger.debug(f'The dimension table "{table_name}" has been read from the database.')
+
+        if path_file is not None :
+            # Replacing the outdated copies of the table (writing to the temporary file first)
+            try :
+                path_file.parent.mkdir(parents=True, exist_ok=True)
+                for el in path_file.parent.glob(f'{table_name}_*.parquet') :
+                    el.unlink()
+                path_tmp = Path(f'{path_file}.{os.getpid()}.tmp')
+                df.to_parquet(path_tmp, index=False)
+                path_tmp.replace(path_file)
+            except Exception as e :
+                log.logger.warning(f'The dimension table "{table_name}" has not been cached: {e}')
+
+        return df
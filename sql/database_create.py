@@ -1,9 +1,10 @@
 # The module for the first initialization and filling in of the database of our store chain.
 
 from datetime import datetime
-import re, random
+import random
+import numpy as np
+import pandas as pd
 from faker import Faker
-from string import ascii_uppercase, ascii_lowercase
 
 import sys
 sys.path.append('.')
@@ -14,10 +15,15 @@ from logger import set_logger
 
 log.logger = set_logger(log_common_set=settings.logging.common, log_specific_set=settings.logging.db_creating)
 
-from pgdb import Database, Rows, DBQueryResult
+from pgdb import Database, Rows, DBQueryResult, iter_frame_rows
 from exceptions import AppDBError
-from chain_stores import goods
+from chain_stores import get_goods
+from gen_utils import get_cash_reg_code
 from app_types import DBCategory, DBDiscount, DBGoods, DBStuff, DBStore, DBCashRegister
+from sql.partition_query import PARTITION_KEY, PARTITION_FUNCTION_QUERY
+from sql.rollup_query import ROLLUP_TABLE, ROLLUP_COLUMNS_STATEMENT
+from sql.ledger_query import LEDGER_TABLE, LEDGER_COLUMNS_STATEMENT
+from sql.progress_query import PROGRESS_TABLE, PROGRESS_COLUMNS_STATEMENT
 
 
 def recreate_tables() -> bool:
@@ -60,7 +66,7 @@ def recreate_tables() -> bool:
                            columns_statement='''
                                 id int4 NOT NULL,
                                 store_id int4 NOT NULL,
-                                cr_receipt_code varchar(2) NOT NULL,
+                                cr_receipt_code varchar(8) NOT NULL,
                                 cashier int4 NOT NULL,                                
                                 CONSTRAINT cash_register_pk PRIMARY KEY (id, store_id),
                                 CONSTRAINT cash_register_store_fk FOREIGN KEY (store_id)
@@ -103,77 +109,157 @@ def recreate_tables() -> bool:
                                 ''',
                            overwrite=True) : return False
 
+    # The main tables are partitioned by the day of the receipt (the partitions are created by the uploader
+    # for the days being loaded), so the partition key is a part of their primary keys.
+    # The foreign key of the receipt lines to the receipts is declared between the partitions of the same day.
+    # The receipt key is either the receipt ID or the bigint packing the store, the cash register and the time
+    # of the receipt (the receipt ID is kept as the secondary "receipt_code" column), see the "receipt_key" setting.
+    if settings.receipt_key == 'bigint' :
+        receipt_key_type, receipt_code_statement = 'bigint', 'receipt_code varchar(24) NOT NULL,'
+    else :
+        receipt_key_type, receipt_code_statement = 'varchar(24)', ''
+
     if not db.create_table(table_name='receipt',
-                           columns_statement='''
-                                id varchar(16) NOT NULL,
+                           columns_statement=f'''
+                                id {receipt_key_type} NOT NULL,
                                 receipt_time timestamp NOT NULL,
                                 store_id int4 NOT NULL,
                                 cash_reg_id int4 NOT NULL,
-                                CONSTRAINT receipt_pk PRIMARY KEY (id),
+                                {receipt_code_statement}
+                                CONSTRAINT receipt_pk PRIMARY KEY (id, receipt_time),
                                 CONSTRAINT receipt_cash_register_fk FOREIGN KEY (cash_reg_id,store_id) 
                                     REFERENCES public.cash_register(id,store_id) ON UPDATE CASCADE
                                 ''',
-                           overwrite=True) : return False
+                           overwrite=True,
+                           partition_statement=f'RANGE ({PARTITION_KEY})') : return False
 
     if not db.create_table(table_name='receipt_line',
-                           columns_statement='''
+                           columns_statement=f'''
                                 id int4 NOT NULL,
-                                id_receipt varchar(16) NOT NULL,
+                                id_receipt {receipt_key_type} NOT NULL,
+                                receipt_time timestamp NOT NULL,
                                 id_item int4 NOT NULL,
                                 amount int4 NOT NULL,
-                                CONSTRAINT receipt_line_pk PRIMARY KEY (id, id_receipt),
+                                CONSTRAINT receipt_line_pk PRIMARY KEY (id, id_receipt, receipt_time),
                                 CONSTRAINT receipt_line_goods_fk FOREIGN KEY (id_item) 
-                                    REFERENCES public.goods(id) ON UPDATE CASCADE,
-                                CONSTRAINT receipt_line_receipt_fk FOREIGN KEY (id_receipt) 
-                                    REFERENCES public.receipt(id) ON UPDATE CASCADE
+                                    REFERENCES public.goods(id) ON UPDATE CASCADE
                                 ''',
+                           overwrite=True,
+                           partition_statement=f'RANGE ({PARTITION_KEY})') : return False
+
+    # The daily sales rollup (the counters of the sales per day and store read by the summary of the uploader)
+    if not db.create_table(table_name=ROLLUP_TABLE,
+                           columns_statement=ROLLUP_COLUMNS_STATEMENT,
                            overwrite=True) : return False
 
+    # The ingestion ledger and the upload progress describe the contents of the main tables: the files registered
+    # as loaded or the batches saved before the re-creation would be skipped by the uploader
+    if not db.create_table(table_name=LEDGER_TABLE,
+                           columns_statement=LEDGER_COLUMNS_STATEMENT,
+                           overwrite=True) : return False
+
+    if not db.create_table(table_name=PROGRESS_TABLE,
+                           columns_statement=PROGRESS_COLUMNS_STATEMENT,
+                           overwrite=True) : return False
+
+    # The function creating the day partitions of the main tables
+    if not db.run_query(PARTITION_FUNCTION_QUERY).is_successful : return False
+
     return True
 
 
-def get_new_phone_number(fake: Faker) -> str:
-    '''
-    Creating a fake phone number in a single format
-    :param fake: the instance of the Faker class
-    :return: a fake phone number as a string
-    '''
-    phone_digits = ''.join(re.findall(r'\d+', fake.phone_number()))
-    new_phone = f'+7 {phone_digits[1 :4]} {phone_digits[4 :7]} {phone_digits[7 :]}'
-    return new_phone
+class FakeIdentities :
+    # a generator of the fake identities (names, phones, addresses) for large batches: the pools of the values
+    # are sampled by Faker once, then the batches are built by the vectorized sampling of the pools
 
+    # The Faker methods giving the pools of the values
+    POOL_PROVIDERS = (
+        'first_name_male', 'middle_name_male', 'last_name_male',
+        'first_name_female', 'middle_name_female', 'last_name_female',
+        'city', 'street_address',
+    )
 
-def add_new_employee(db: Database, fake: Faker, salary_range: tuple) -> int :
+    def __init__(self, fake: Faker, pool_size: int = 1000) -> None:
+        '''
+        Constructor
+        :param fake: the instance of the Faker class (the pools and the batches are reproducible from "Faker.seed")
+        :param pool_size: the number of the values sampled by Faker for each pool
+        '''
+        self._pools: dict[str, np.ndarray] = {
+            name : np.asarray([getattr(fake, name)() for _ in range(pool_size)]) for name in self.POOL_PROVIDERS
+        }
+        # The random generator of the batches is seeded from the random generator of Faker
+        self._rng: np.random.Generator = np.random.default_rng(fake.random.getrandbits(64))
+
+    def _sample(self, name: str, number: int) -> np.ndarray :
+        ''' Sampling the pool of the values '''
+        pool = self._pools[name]
+        return pool[self._rng.integers(0, len(pool), number)]
+
+    def get_phone_numbers(self, number: int) -> list[str] :
+        '''
+        Creating fake phone numbers in a single format ("+7 XXX XXX XXXX", all the digits are random as in Faker)
+        :param number: the number of the phone numbers
+        :return: the list of the phone numbers
+        '''
+        digits = self._rng.integers(0, 10**10, number)
+        return [f'+7 {d // 10**7:03d} {d // 10**4 % 1000:03d} {d % 10**4:04d}' for d in digits.tolist()]
+
+    def get_addresses(self, number: int) -> list[str] :
+        '''
+        Creating fake addresses ("<city>, <street address>, <postcode>" - as in Faker)
+        :param number: the number of the addresses
+        :return: the list of the addresses
+        '''
+        postcodes = self._rng.integers(0, 10**6, number)
+        return [
+            f'{city}, {street}, {postcode:06d}' for city, street, postcode in zip(
+                self._sample('city', number).tolist(), self._sample('street_address', number).tolist(),
+                postcodes.tolist()
+            )
+        ]
+
+    def get_employees(self, salary_range: list[int], number: int) -> pd.DataFrame :
+        '''
+        Creating new employees
+        :param salary_range: the range of salaries
+        :param number: the number of the employees
+        :return: the data frame of the new employees with the DBStuff fields (without IDs - they're given
+                 by the database)
+        '''
+        is_male = self._rng.integers(0, 2, number).astype(bool)
+        names = {
+            part : np.where(is_male, self._sample(f'{part}_male', number), self._sample(f'{part}_female', number))
+            for part in ('first_name', 'middle_name', 'last_name')
+        }
+        # The salaries are the multiples of the step in the range (as "random.randrange" gives)
+        step = settings.store_chain.stuff.multiplicity_of_the_salary_sum
+        salaries = salary_range[0] + step * self._rng.integers(0, len(range(*salary_range, step)), number)
+        return pd.DataFrame({
+            'first_name' : names['first_name'].astype(object),
+            'middle_name' : names['middle_name'].astype(object),
+            'last_name' : names['last_name'].astype(object),
+            'salary' : salaries,
+            'phone' : self.get_phone_numbers(number),
+        }, columns=list(DBStuff._fields))
+
+
+def add_new_employees(db: Database, employees: pd.DataFrame) -> list[int] :
     '''
-    Creating new employee
+    Adding all the new employees at once (one multi-row insertion instead of a round trip per employee)
     :param db: the instance of the Database class
-    :param fake: the instance of the Faker class
-    :param salary_range: the range of salaries
-    :return: the ID of the new employee (as an entry in the database)
+    :param employees: the data frame of the new employees (see the "FakeIdentities.get_employees" method)
+    :return: the IDs of the new employees (as entries in the database) in the order of the data frame
     '''
-    if random.randint(0, 1) :
-        first_name, middle_name, last_name = fake.first_name_male(), fake.middle_name_male(), fake.last_name_male()
-    else :
-        first_name, middle_name, last_name = fake.first_name_female(), fake.middle_name_female(), fake.last_name_female()
-    salary = random.randrange(*salary_range, settings.store_chain.stuff.multiplicity_of_the_salary_sum)
-    values: Rows = (
-        DBStuff(
-            first_name=first_name,
-            middle_name=middle_name,
-            last_name=last_name,
-            salary=salary,
-            phone=get_new_phone_number(fake=fake)
-        ),
-    )
     res = fill_in_one_table(
         db=db,
         table_name='stuff',
-        values=values,
+        values=tuple(DBStuff(*row) for row in iter_frame_rows(employees)),
         insert_fields=DBStuff._fields,
-        returning_field='id',
-        mute=True)
+        returning_field='id')
 
-    return res.value[0][0]
+    # The identity IDs are generated in the order of the inserted rows
+    return sorted(row[0] for row in res.value)
 
 
 def fill_in_one_table(
@@ -220,9 +306,12 @@ def fill_in_tables() :
         return False
 
     try:
-        # initializing the Faker module
-        Faker.seed(random.randint(0, 9999))
+        # initializing the Faker module (all the fake data are reproducible from its seed)
+        seed = random.randint(0, 9999)
+        Faker.seed(seed)
         fake = Faker('ru_RU')
+        identities = FakeIdentities(fake=fake)
+        log.logger.debug(f'The seed of the fake data: {seed}.')
 
         # filling in the table "category"
         values: Rows = tuple(
@@ -238,6 +327,7 @@ def fill_in_tables() :
         fill_in_one_table(db=db, table_name='discount', values=values, insert_fields=DBDiscount._fields)
 
         # filling in the table "goods"
+        goods = get_goods()
         # encoding discounts
         discounts_dict = dict(
             zip(
@@ -247,26 +337,41 @@ def fill_in_tables() :
         )
         values: Rows = tuple(
             DBGoods(
-                item_name=f'{settings.store_chain.goods.name_prefix[item.category_key]}{item.item_key}',
-                category_id=item.category_key+1,
-                price=float(item.price),
-                discount_id=discounts_dict.get(item.discount, 1),
-                purchase_price=float(item.price * 0.7) )
-            for item in goods.goods
+                item_name=f'{settings.store_chain.goods.name_prefix[category_key]}{item_key}',
+                category_id=int(category_key)+1,
+                price=float(price),
+                discount_id=discounts_dict.get(float(discount), 1),
+                purchase_price=float(price * 0.7) )
+            for category_key, item_key, price, discount in zip(
+                goods.category_keys, goods.item_keys, goods.prices, goods.discounts
+            )
         )
         fill_in_one_table(db=db, table_name='goods', values=values, insert_fields=DBGoods._fields)
 
+        # filling in the table "stuff": the managers of the stores and the cashiers of the cash registers
+        stores = settings.store_chain.stores
+        managers = identities.get_employees(
+            salary_range=settings.store_chain.stuff.range_of_manager_salary, number=len(stores.opening_hours)
+        )
+        cashiers = identities.get_employees(
+            salary_range=settings.store_chain.stuff.range_of_cashier_salary, number=sum(stores.cash_registers)
+        )
+        employee_ids = add_new_employees(db=db, employees=pd.concat([managers, cashiers], ignore_index=True))
+        manager_ids, cashier_ids = employee_ids[:len(managers)], iter(employee_ids[len(managers):])
+
         # filling in the table "store"
+        addresses = identities.get_addresses(number=len(stores.opening_hours))
+        phones = identities.get_phone_numbers(number=len(stores.opening_hours))
         values: Rows = tuple(
             DBStore(
                 id=i,
                 store_name=f'Магазин_{i}',
                 opening_hour=opening_h[0],
                 closing_hour=opening_h[1],
-                address=fake.address(),
-                phone=get_new_phone_number(fake=fake),
-                manager=add_new_employee(db=db, fake=fake, salary_range=settings.store_chain.stuff.range_of_manager_salary)
-            ) for i, opening_h in enumerate(settings.store_chain.stores.opening_hours, start=1)
+                address=addresses[i-1],
+                phone=phones[i-1],
+                manager=manager_ids[i-1]
+            ) for i, opening_h in enumerate(stores.opening_hours, start=1)
         )
         fill_in_one_table(db=db, table_name='store', values=values)
 
@@ -275,21 +380,13 @@ def fill_in_tables() :
             DBCashRegister(
                 id=j,
                 store_id=i,
-                cr_receipt_code=ascii_uppercase[i-1] + ascii_lowercase[j-1],
-                cashier=add_new_employee(db=db, fake=fake, salary_range=settings.store_chain.stuff.range_of_cashier_salary)
-            ) for i, cash_regs in enumerate(settings.store_chain.stores.cash_registers, start=1)
+                cr_receipt_code=get_cash_reg_code(id_store=i, id_cash_reg=j),
+                cashier=next(cashier_ids)
+            ) for i, cash_regs in enumerate(stores.cash_registers, start=1)
             for j in range(1, cash_regs+1)
         )
         fill_in_one_table(db=db, table_name='cash_register', values=values)
 
-
-        # filling in the table "stuff"
-        # number_of_staff = len(settings.store_chain.stores.ranks) + sum(settings.store_chain.stores.cash_registers)
-        #
-        # for _ in range(number_of_staff) :
-        #     add_new_employee(db=db, fake=fake, salary_range=settings.store_chain.stuff.range_of_cashier_salary)
-
-
     except AppDBError as e:
         log.logger.error(f'Error: {e}')
         return False
@@ -0,0 +1,49 @@
+# A module for SQL query texts of the ingestion ledger - the register of the uploaded sales data files.
+
+LEDGER_TABLE = 'ingestion_ledger'
+
+# The file is identified by its name (relative to the sales data folder) and the hash of its contents
+# The ledger describes the contents of the main tables, so it's re-created together with them
+LEDGER_COLUMNS_STATEMENT = f'''
+    file_name varchar not null,
+    file_hash varchar(40) not null,
+    status varchar(8) not null,
+    run_id varchar(32) not null,
+    claimed_at timestamp not null default now(),
+    loaded_at timestamp null,
+    constraint {LEDGER_TABLE}_pk primary key (file_name, file_hash)
+'''
+
+LEDGER_CREATE_QUERY = f'create table if not exists {LEDGER_TABLE} ({LEDGER_COLUMNS_STATEMENT})'
+
+LEDGER_DONE_QUERY = f"select file_name, file_hash from {LEDGER_TABLE} where status = 'done'"
+
+# Claiming the files by the run of the uploader (the parameters - the arrays of the file names and hashes, the run ID
+# and the claim timeout in minutes). Only the new files, the files of the failed runs and the files claimed by a run
+# longer than the timeout ago (an interrupted run) are claimed, the files of the live runs are left to them.
+# The claimed files are returned - the run loads only them.
+LEDGER_CLAIM_QUERY = f'''
+insert into {LEDGER_TABLE} (file_name, file_hash, status, run_id)
+select f.file_name, f.file_hash, 'claimed', %s
+from unnest(%s::varchar[], %s::varchar[]) as f (file_name, file_hash)
+on conflict (file_name, file_hash) do update
+set status = 'claimed', run_id = excluded.run_id, claimed_at = now(), loaded_at = null
+where {LEDGER_TABLE}.status = 'failed'
+   or ({LEDGER_TABLE}.status = 'claimed' and {LEDGER_TABLE}.claimed_at < now() - %s * interval '1 minute')
+returning file_name, file_hash
+'''
+
+# Marking the file claimed by the run as loaded or failed (the claim taken over by another run isn't changed)
+LEDGER_MARK_QUERY = f'''
+update {LEDGER_TABLE}
+set status = %s, loaded_at = case when %s = 'done' then now() end
+where file_name = %s and file_hash = %s and run_id = %s
+'''
+
+# Marking all the files claimed by the run as loaded (in the same transaction with the loading, the parameter -
+# the run ID)
+LEDGER_RUN_DONE_QUERY = f'''
+update {LEDGER_TABLE}
+set status = 'done', loaded_at = now()
+where run_id = %s and status = 'claimed'
+'''
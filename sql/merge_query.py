@@ -0,0 +1,147 @@
+# A module for SQL query texts of the set-based merging of the sales data through the staging table.
+
+from gen_utils import RECEIPT_STAMP_LEN, RECEIPT_KEY_STORE_SHIFT, RECEIPT_KEY_CASH_REG_SHIFT, RECEIPT_KEY_EPOCH
+from sql.partition_query import PARTITION_FUNCTION
+from sql.rollup_query import ROLLUP_REFRESH_QUERY
+
+STAGING_TABLE = 'sales_staging'
+
+# The columns of the staging table in the order of loading (the fields of the sales data files)
+STAGING_FIELDS = ('doc_id', 'item', 'category', 'amount', 'price', 'discount', 'receipt_time')
+
+# The staging table is unlogged: its contents live only between the loading and the merging
+STAGING_CREATE_QUERY = f'''
+create unlogged table if not exists {STAGING_TABLE} (
+    id bigint generated always as identity,
+    doc_id varchar(24) not null,
+    item varchar not null,
+    category varchar null,
+    amount int4 not null,
+    price numeric(10, 2) null,
+    discount numeric(4, 2) null,
+    receipt_time timestamp not null
+)
+'''
+
+STAGING_CLEAR_QUERY = f'truncate table {STAGING_TABLE} restart identity'
+
+# The number of receipts and receipt lines loaded into the staging table
+STAGING_COUNT_QUERY = f'''
+select
+    count(distinct s.doc_id) as receipts,
+    count(*) as receipt_lines
+from {STAGING_TABLE} s
+'''
+
+# Rejecting the staged sales with an unknown store/cashier's identification code or product: the joins of the merging
+# would silently drop such lines, so the merging fails as a whole (as the uploading of such files in other modes does)
+# with the number of the rejected lines and the unknown codes and products
+STAGING_REJECT_QUERY = f'''
+do $$
+declare
+    rejected_lines int8;
+    unknown_codes text;
+    unknown_items text;
+begin
+    select
+        count(*),
+        string_agg(distinct left(s.doc_id, -{RECEIPT_STAMP_LEN}), ', ') filter (where cr.id is null),
+        string_agg(distinct s.item, ', ') filter (where g.id is null)
+    into rejected_lines, unknown_codes, unknown_items
+    from {STAGING_TABLE} s
+    left join cash_register cr
+    on cr.cr_receipt_code = left(s.doc_id, -{RECEIPT_STAMP_LEN})
+    left join goods g
+    on g.item_name = s.item
+    where cr.id is null or g.id is null;
+
+    if rejected_lines > 0 then
+        raise exception using message = rejected_lines || ' staged receipt lines have been rejected '
+            || '(unknown store/cashier''s identification codes: ' || coalesce(unknown_codes, '-')
+            || '; unknown products: ' || coalesce(unknown_items, '-') || ')';
+    end if;
+end
+$$
+'''
+
+# Creating the partitions of the main tables for the days of the staged sales
+MERGE_PARTITION_QUERY = f'''
+select {PARTITION_FUNCTION}(min(receipt_time)::date, max(receipt_time)::date)
+from {STAGING_TABLE}
+'''
+
+# The store and the cash register are decoded by the code of the cash register - the receipt ID without its time
+_CASH_REG_JOIN = f'''
+join cash_register cr
+on cr.cr_receipt_code = left(s.doc_id, -{RECEIPT_STAMP_LEN})
+'''
+
+# The packed bigint receipt key of the "receipt_key" setting (see the "pack_receipt_keys" function of "gen_utils")
+_RECEIPT_KEY = (f"(cr.store_id::int8 << {RECEIPT_KEY_STORE_SHIFT}) | (cr.id::int8 << {RECEIPT_KEY_CASH_REG_SHIFT}) | "
+                f"extract(epoch from {{receipt_time}} - timestamp '{RECEIPT_KEY_EPOCH}')::int8")
+
+MERGE_RECEIPT_QUERY = f'''
+insert into receipt (id, receipt_time, store_id, cash_reg_id)
+select
+    s.doc_id,
+    min(s.receipt_time),
+    cr.store_id,
+    cr.id
+from {STAGING_TABLE} s{_CASH_REG_JOIN}group by s.doc_id, cr.store_id, cr.id
+on conflict do nothing
+'''
+
+MERGE_RECEIPT_KEY_QUERY = f'''
+insert into receipt (id, receipt_time, store_id, cash_reg_id, receipt_code)
+select
+    {_RECEIPT_KEY.format(receipt_time='min(s.receipt_time)')},
+    min(s.receipt_time),
+    cr.store_id,
+    cr.id,
+    s.doc_id
+from {STAGING_TABLE} s{_CASH_REG_JOIN}group by s.doc_id, cr.store_id, cr.id
+on conflict do nothing
+'''
+
+# The lines are numbered inside the receipts in the order of loading (as in the sales data files)
+_STAGING_LINES = f'''
+    select
+        row_number() over (partition by doc_id order by id) as id_line,
+        doc_id,
+        min(receipt_time) over (partition by doc_id) as receipt_time,
+        item,
+        amount
+    from {STAGING_TABLE}
+'''
+
+MERGE_RECEIPT_LINE_QUERY = f'''
+insert into receipt_line (id, id_receipt, receipt_time, id_item, amount)
+select
+    s.id_line,
+    s.doc_id,
+    s.receipt_time,
+    g.id,
+    s.amount
+from ({_STAGING_LINES}) s
+join goods g
+on g.item_name = s.item
+on conflict do nothing
+'''
+
+MERGE_RECEIPT_LINE_KEY_QUERY = f'''
+insert into receipt_line (id, id_receipt, receipt_time, id_item, amount)
+select
+    s.id_line,
+    {_RECEIPT_KEY.format(receipt_time='s.receipt_time')},
+    s.receipt_time,
+    g.id,
+    s.amount
+from ({_STAGING_LINES}) s{_CASH_REG_JOIN}join goods g
+on g.item_name = s.item
+on conflict do nothing
+'''
+
+# Refreshing the daily sales rollup for the days of the staged sales (in the same transaction with the merging)
+MERGE_ROLLUP_QUERY = ROLLUP_REFRESH_QUERY.format(
+    days=f'select min(receipt_time)::date, max(receipt_time)::date from {STAGING_TABLE}'
+)
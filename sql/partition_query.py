@@ -0,0 +1,54 @@
+# A module for SQL query texts of the partitioning of the main tables by the day of the receipt.
+
+# The main tables are partitioned by the range of the receipt time: one partition per day (e.g. "receipt_20250331")
+PARTITIONED_TABLES = ('receipt', 'receipt_line')
+PARTITION_KEY = 'receipt_time'
+PARTITION_FUNCTION = 'create_receipt_partitions'
+
+# Creating the missing day partitions of the main tables, the function returns the number of the created partitions.
+# The receipt lines of the day refer to the receipts of the same day: the foreign key is declared between
+# the partitions, since the check of the key referencing the partitioned table is much slower.
+# The concurrent calls are serialized by the advisory lock (the lock is held until the end of the transaction).
+# The main tables are locked only if some partitions are missing, and in the same order as the uploading of
+# the receipt lines locks them (the referencing table first), so the creation doesn't deadlock with the uploading.
+# There is no "%" in the text: the driver formats the query even with the empty parameters.
+PARTITION_FUNCTION_QUERY = f'''
+create or replace function {PARTITION_FUNCTION}(day_from date, day_to date)
+returns int
+language plpgsql
+as $$
+declare
+    partition_day date;
+    parent_table text;
+    partition_table text;
+    created int := 0;
+begin
+    perform pg_advisory_xact_lock(hashtext('{PARTITION_FUNCTION}'));
+    for partition_day in select generate_series(day_from, day_to, interval '1 day')::date loop
+        foreach parent_table in array array[{", ".join(f"'{t}'" for t in PARTITIONED_TABLES)}] loop
+            partition_table := parent_table || '_' || to_char(partition_day, 'YYYYMMDD');
+            if to_regclass(partition_table) is null then
+                if created = 0 then
+                    lock table {", ".join(reversed(PARTITIONED_TABLES))} in access exclusive mode;
+                end if;
+                execute 'create table ' || quote_ident(partition_table)
+                    || ' partition of ' || quote_ident(parent_table)
+                    || ' for values from (' || quote_literal(partition_day)
+                    || ') to (' || quote_literal(partition_day + 1) || ')';
+                if parent_table = '{PARTITIONED_TABLES[1]}' then
+                    execute 'alter table ' || quote_ident(partition_table)
+                        || ' add constraint ' || quote_ident(partition_table || '_receipt_fk')
+                        || ' foreign key (id_receipt, receipt_time) references '
+                        || quote_ident('{PARTITIONED_TABLES[0]}_' || to_char(partition_day, 'YYYYMMDD'))
+                        || ' (id, receipt_time) on update cascade';
+                end if;
+                created := created + 1;
+            end if;
+        end loop;
+    end loop;
+    return created;
+end
+$$
+'''
+
+PARTITION_CREATE_QUERY = f'select {PARTITION_FUNCTION}(%s, %s)'
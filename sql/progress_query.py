@@ -0,0 +1,27 @@
+# A module for SQL query texts of the progress of the batched uploading - the resuming of the interrupted uploading.
+
+# The progress of the uploading of the data (the source - the table name and the fingerprint of the data),
+# it's saved in the transaction of each batch and deleted after the completion of the uploading.
+# The saved batches refer to the contents of the main tables, so the table is re-created together with them.
+PROGRESS_TABLE = 'upload_progress'
+
+PROGRESS_COLUMNS_STATEMENT = f'''
+    source varchar not null,
+    rows int4 not null,
+    last_key varchar not null,
+    updated_at timestamp not null default now(),
+    constraint {PROGRESS_TABLE}_pk primary key (source)
+'''
+
+PROGRESS_CREATE_QUERY = f'create table if not exists {PROGRESS_TABLE} ({PROGRESS_COLUMNS_STATEMENT})'
+
+PROGRESS_READ_QUERY = f'select rows, last_key from {PROGRESS_TABLE} where source = %s'
+
+PROGRESS_SAVE_QUERY = f'''
+insert into {PROGRESS_TABLE} (source, rows, last_key)
+values (%s, %s, %s)
+on conflict (source) do update
+set rows = excluded.rows, last_key = excluded.last_key, updated_at = now()
+'''
+
+PROGRESS_DELETE_QUERY = f'delete from {PROGRESS_TABLE} where source = %s'
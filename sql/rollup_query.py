@@ -0,0 +1,81 @@
+# A module for SQL query texts of the daily sales rollup - the counters of the sales per day and store.
+
+ROLLUP_TABLE = 'sales_daily'
+
+# The revenue is counted at the prices of the goods at the time of the refresh of the day
+ROLLUP_COLUMNS_STATEMENT = f'''
+    sales_day date not null,
+    store_id int4 not null,
+    receipts int8 not null,
+    receipt_lines int8 not null,
+    items int8 not null,
+    revenue numeric(16, 2) not null,
+    updated_at timestamp not null default now(),
+    constraint {ROLLUP_TABLE}_pk primary key (sales_day, store_id)
+'''
+
+ROLLUP_CREATE_QUERY = f'create table if not exists {ROLLUP_TABLE} ({ROLLUP_COLUMNS_STATEMENT})'
+
+# Recounting the days of the range ("{{days}}" - the query of the first and the last day) from the main tables.
+# The range is passed by the scalar subqueries, so only the partitions of these days are read.
+# There is no "%" in the text: the driver formats the query with the parameters.
+ROLLUP_REFRESH_QUERY = f'''
+with days (day_from, day_to) as (
+    {{days}}
+),
+receipts as (
+    select
+        r.receipt_time::date as sales_day,
+        r.store_id,
+        count(*) as receipts
+    from receipt r
+    where r.receipt_time >= (select day_from from days)
+      and r.receipt_time < (select day_to + 1 from days)
+    group by 1, 2
+),
+lines as (
+    select
+        r.receipt_time::date as sales_day,
+        r.store_id,
+        count(*) as receipt_lines,
+        sum(rl.amount) as items,
+        sum(rl.amount * g.price) as revenue
+    from receipt_line rl
+    join receipt r
+    on r.id = rl.id_receipt and r.receipt_time = rl.receipt_time
+    left join goods g
+    on g.id = rl.id_item
+    where rl.receipt_time >= (select day_from from days)
+      and rl.receipt_time < (select day_to + 1 from days)
+      and r.receipt_time >= (select day_from from days)
+      and r.receipt_time < (select day_to + 1 from days)
+    group by 1, 2
+)
+insert into {ROLLUP_TABLE} (sales_day, store_id, receipts, receipt_lines, items, revenue)
+select
+    rc.sales_day,
+    rc.store_id,
+    rc.receipts,
+    coalesce(l.receipt_lines, 0),
+    coalesce(l.items, 0),
+    coalesce(l.revenue, 0)
+from receipts rc
+left join lines l
+using (sales_day, store_id)
+order by rc.sales_day, rc.store_id
+on conflict (sales_day, store_id) do update
+set receipts = excluded.receipts,
+    receipt_lines = excluded.receipt_lines,
+    items = excluded.items,
+    revenue = excluded.revenue,
+    updated_at = now()
+'''
+
+# Refreshing the loaded days (the parameters - the first and the last day)
+ROLLUP_DAYS_QUERY = ROLLUP_REFRESH_QUERY.format(days='select %s::date, %s::date')
+
+# Filling in the rollup with all the days of the main tables - only if it's empty (e.g. it has just been created
+# in the database loaded before), otherwise the range of the days is empty and nothing is read
+ROLLUP_BACKFILL_QUERY = ROLLUP_REFRESH_QUERY.format(days=f'''select min(receipt_time)::date, max(receipt_time)::date
+    from receipt
+    where not exists (select from {ROLLUP_TABLE})''')
@@ -1,12 +1,15 @@
 # A module for a large SQL query text of summary information.
 
-SUMMARY_QUERY = '''
+from sql.rollup_query import ROLLUP_TABLE
+
+# The sales counters are read from the daily sales rollup, not from the main tables
+SUMMARY_QUERY = f'''
 --Summary info
 select 
     0 as line,
     'total_dates_in_database' as rep_param_name, 
-    count(distinct date(r.receipt_time)) as rep_param_value
-from receipt r
+    count(distinct sd.sales_day) as rep_param_value
+from {ROLLUP_TABLE} sd
 union
 select 
     1 as line,
@@ -29,27 +32,25 @@ union
 select 
     4 as line,
     'total_receipts' as rep_param_name, 
-    count(distinct r.id) as rep_param_value 
-from receipt r 
+    coalesce(sum(sd.receipts), 0) as rep_param_value 
+from {ROLLUP_TABLE} sd 
 union
 select 
     5 as line,
     'total_receipt_lines' as rep_param_name, 
-    count(*) as rep_param_value
-from receipt_line rl 
+    coalesce(sum(sd.receipt_lines), 0) as rep_param_value
+from {ROLLUP_TABLE} sd 
 union
 select 
     6 as line,
     'total_amount_items' as rep_param_name, 
-    sum(rl.amount) as rep_param_value
-from receipt_line rl 
+    coalesce(sum(sd.items), 0) as rep_param_value
+from {ROLLUP_TABLE} sd 
 union
 select 
     7 as line,
     'total_revenue' as rep_param_name, 
-    sum(rl.amount * g.price) as rep_param_value
-from receipt_line rl 
-left join goods g 
-on rl.id_item = g.id 
+    coalesce(sum(sd.revenue), 0) as rep_param_value
+from {ROLLUP_TABLE} sd 
 order by line
 '''